@@ -1,9 +1,14 @@
-import os, html
+import os, html, uuid, time, threading
 from flask import Flask, request, Response
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse, Gather
 from dotenv import load_dotenv
 from openai import OpenAI
+from conversation_store import ConversationStore, make_backend, HISTORY_SUMMARIZE
+from reply_cache import ReplyCache
+from reply_stream import SentenceSplitter, PendingReplies
+from campaign import CampaignDialer, STATUS_CALLBACK_EVENTS, numbers_from_request
+from metrics import metrics, get_logger
 
 load_dotenv()
 
@@ -13,6 +18,9 @@ TWILIO_AUTH_TOKEN   = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER  = os.getenv("TWILIO_FROM_NUMBER")
 OPENAI_API_KEY      = os.getenv("OPENAI_API_KEY")
 PUBLIC_URL          = os.getenv("PUBLIC_URL", "").rstrip("/")
+GATHER_STREAMING    = os.getenv("GATHER_STREAMING", "1") == "1"   # speak the first sentence while the rest streams
+FIRST_SENTENCE_TIMEOUT = float(os.getenv("FIRST_SENTENCE_TIMEOUT", 8))
+CONTINUE_TIMEOUT       = float(os.getenv("CONTINUE_TIMEOUT", 10))
 HOST = "0.0.0.0"
 PORT = 5050
 
@@ -23,7 +31,7 @@ if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_NUMBER, OPENAI_AP
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 app = Flask(__name__)
-conversations = {}
+log = get_logger()
 
 SYSTEM_PROMPT = """You are a friendly Tamil-English bilingual assistant.
 Detect whether the user speaks Tamil or English and reply in the same language.
@@ -32,25 +40,134 @@ Keep responses short and natural for voice.
 If user says bye or thank you, end the conversation politely.
 """
 
+def summarize_turns(summary, turns):
+    """Fold turns that no longer fit the token budget into the rolling summary."""
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    try:
+        r = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{
+                "role": "user",
+                "content": "Update this phone call summary with the new lines. Keep names, dates, "
+                           "times and anything agreed. Reply with the summary only, under 80 words.\n\n"
+                           f"Summary: {summary or '(none)'}\n\nNew lines:\n{transcript}",
+            }],
+            max_tokens=150,
+            temperature=0,
+        )
+        return r.choices[0].message.content.strip()
+    except Exception as e:
+        log.info(f"OpenAI summary error: {e}")
+        return summary
+
+
+conversation_store = ConversationStore(
+    make_backend(),
+    summarize=summarize_turns if HISTORY_SUMMARIZE else None,
+)
+reply_cache = ReplyCache()
+pending_replies = PendingReplies(conversation_store.backend)
+
+FALLBACK_REPLY = "Sorry, I'm having trouble understanding now."
+END_WORDS = ["bye", "goodbye", "thank", "see you", "talk later", "see you later"]
+
+
+def has_end_word(text):
+    text = text.lower()
+    return any(w in text for w in END_WORDS)
+
+
+def has_tamil(text):
+    return any("\u0b80" <= c <= "\u0bff" for c in text)
+
+
+def last_assistant_line(conversation):
+    for turn in reversed(conversation.turns):
+        if turn["role"] == "assistant":
+            return turn["content"]
+    return ""
+
+
 def gpt_reply(call_sid, text):
-    history = conversations.get(call_sid, [])
-    history.append({"role": "user", "content": text})
+    conversation = conversation_store.load(call_sid)
+    context = last_assistant_line(conversation)
+    conversation.add("user", text)
+
+    reply = reply_cache.get(text, context)
+    metrics.inc("reply_cache_hits_total" if reply is not None else "reply_cache_misses_total")
+    if reply is None:
+        started = time.monotonic()
+        try:
+            r = openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "system", "content": SYSTEM_PROMPT}] + conversation.messages(),
+                max_tokens=200,
+                temperature=0.6,
+            )
+            reply = r.choices[0].message.content.strip()
+            reply_cache.put(text, context, reply)
+        except Exception as e:
+            log.info(f"OpenAI error: {e}")
+            reply = FALLBACK_REPLY
+        metrics.observe("gather_reply_ms", (time.monotonic() - started) * 1000)
+
+    conversation.add("assistant", reply)
+    conversation_store.save(call_sid, conversation)
+    return reply
+
+
+def stream_reply(call_sid, conversation, context, text, reply_id, should_end):
+    """
+    Stream a completion and publish it sentence by sentence for /gather and
+    /gather/continue. Tamil and end-of-conversation checks run per sentence.
+    """
+    splitter = SentenceSplitter()
+    spoken, parts = [], []
+    failed = False
+    started = time.monotonic()
+
+    def push(sentences):
+        nonlocal should_end
+        if sentences and not spoken:
+            metrics.observe("gather_first_sentence_ms", (time.monotonic() - started) * 1000)
+        for sentence in sentences:
+            parts.append(sentence)
+            if has_tamil(sentence) and not any(has_tamil(p) for p in parts[:-1]):
+                sentence = "Tamil detected. " + sentence  # Twilio can't TTS Tamil yet
+            should_end = should_end or has_end_word(sentence)
+            spoken.append(sentence)
+        if sentences:
+            pending_replies.publish(reply_id, spoken, False, should_end)
 
     try:
-        r = openai_client.chat.completions.create(
+        stream = openai_client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + history,
+            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + conversation.messages(),
             max_tokens=200,
             temperature=0.6,
+            stream=True,
+            timeout=20,
         )
-        reply = r.choices[0].message.content.strip()
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                push(splitter.feed(delta))
+        push(splitter.flush())
     except Exception as e:
-        print("OpenAI error:", e)
-        reply = "Sorry, I'm having trouble understanding now."
+        log.info(f"OpenAI error: {e}")
+        failed = True
+        push(splitter.flush() or ([] if parts else [FALLBACK_REPLY]))
 
-    history.append({"role": "assistant", "content": reply})
-    conversations[call_sid] = history
-    return reply
+    reply = " ".join(parts)
+    metrics.observe("gather_reply_ms", (time.monotonic() - started) * 1000)
+    log.info(f"AI reply: {reply}")
+
+    # Save before publishing `done`: an ending turn deletes the history once it sees `done`
+    if not failed:
+        reply_cache.put(text, context, reply)
+    conversation.add("assistant", reply)
+    conversation_store.save(call_sid, conversation)
+    pending_replies.publish(reply_id, spoken, True, should_end)
 
 
 @app.route("/make_call", methods=["POST"])
@@ -62,10 +179,78 @@ def make_call():
         url=f"{PUBLIC_URL}/voice",
         method="POST"
     )
-    print(f"📞 Call started to {to}")
+    log.info(f"📞 Call started to {to}")
     return {"sid": call.sid}
 
 
+# --- Bulk campaigns ---
+def place_campaign_call(to, status_callback):
+    call = twilio_client.calls.create(
+        to=to,
+        from_=TWILIO_FROM_NUMBER,
+        url=f"{PUBLIC_URL}/voice",
+        method="POST",
+        status_callback=status_callback,
+        status_callback_event=STATUS_CALLBACK_EVENTS,
+        status_callback_method="POST"
+    )
+    return call.sid
+
+
+campaign_dialer = None
+campaign_dialer_lock = threading.Lock()
+
+
+def start_campaign_dialer():
+    """
+    Start this worker's dialer, once. Called when the worker boots (the
+    `post_worker_init` hook in gunicorn.conf.py, or `__main__`) rather than
+    at import, so under `gunicorn --preload` the thread and SQLite
+    connection are made after the fork, and a restarted worker resumes the
+    queue without waiting for traffic.
+    """
+    global campaign_dialer
+    if campaign_dialer is not None:
+        return
+    with campaign_dialer_lock:
+        if campaign_dialer is None:
+            dialer = CampaignDialer(
+                place_campaign_call,
+                f"{PUBLIC_URL}/campaigns/status",
+                os.getenv("CAMPAIGN_DB", "campaigns.db"),
+            )
+            dialer.start()
+            campaign_dialer = dialer
+
+
+# Servers without the gunicorn hook still get a dialer on the first request
+app.before_request(start_campaign_dialer)
+
+
+@app.route("/campaigns", methods=["POST"])
+def create_campaign():
+    numbers = numbers_from_request(request.form, request.files, request.get_json(silent=True))
+    if not numbers:
+        return {"error": "No numbers given"}, 400
+    return {"id": campaign_dialer.create(numbers), "queued": len(numbers)}, 201
+
+
+@app.route("/campaigns/<int:campaign_id>", methods=["GET"])
+def campaign_progress(campaign_id):
+    progress = campaign_dialer.progress(campaign_id)
+    if progress is None:
+        return {"error": "Unknown campaign"}, 404
+    return progress
+
+
+@app.route("/campaigns/status", methods=["POST"])
+def campaign_status():
+    campaign_dialer.on_status(
+        request.form.get("CallSid"), request.form.get("CallStatus"), request.form.get("SequenceNumber")
+    )
+    return "", 204
+
+
 @app.route("/voice", methods=["POST"])
 def voice():
     resp = VoiceResponse()
@@ -91,7 +276,7 @@ def voice():
 def gather():
     call_sid = request.form.get("CallSid")
     speech_result = html.unescape(request.form.get("SpeechResult", "")).strip()
-    print(f"/gather SpeechResult={speech_result}")
+    log.info(f"/gather SpeechResult={speech_result}")
 
     if not speech_result:
         # Reprompt if nothing heard
@@ -107,30 +292,34 @@ def gather():
         resp.append(g)
         return Response(str(resp), mimetype="text/xml")
 
+    if GATHER_STREAMING:
+        return start_streamed_reply(call_sid, speech_result)
+
     # --- Generate AI reply ---
     reply = gpt_reply(call_sid, speech_result)
-    print(f"AI reply: {reply}")
+    log.info(f"AI reply: {reply}")
 
     lang = "en-IN"
-    if any("\u0b80" <= c <= "\u0bff" for c in reply):
+    if has_tamil(reply):
         reply = "Tamil detected. " + reply  # Twilio can't TTS Tamil yet
         lang = "en-IN"
 
     # --- End-of-conversation detection ---
-    user_lower = speech_result.lower()
-    reply_lower = reply.lower()
-    end_words = ["bye", "goodbye", "thank", "see you", "talk later", "see you later"]
-
-    should_end = any(w in user_lower for w in end_words) or any(w in reply_lower for w in end_words)
+    should_end = has_end_word(speech_result) or has_end_word(reply)
 
     # --- Build TwiML ---
     resp = VoiceResponse()
     resp.say(reply, voice="alice", language=lang)
+    finish_turn(resp, call_sid, should_end)
+    return Response(str(resp), mimetype="text/xml")
+
 
+def finish_turn(resp, call_sid, should_end, lang="en-IN"):
     if should_end:
         resp.say("Okay Vinod, take care! Goodbye.", voice="alice", language=lang)
         resp.hangup()
-        print("🔚 Ending call now.")
+        conversation_store.delete(call_sid)
+        log.info("🔚 Ending call now.")
     else:
         g = Gather(
             input="speech",
@@ -141,9 +330,86 @@ def gather():
         )
         resp.append(g)
 
+
+def start_streamed_reply(call_sid, speech_result):
+    started = time.monotonic()
+    conversation = conversation_store.load(call_sid)
+    context = last_assistant_line(conversation)
+    conversation.add("user", speech_result)
+    should_end = has_end_word(speech_result)
+
+    # Frequent short utterances skip the model entirely
+    cached = reply_cache.get(speech_result, context)
+    metrics.inc("reply_cache_hits_total" if cached is not None else "reply_cache_misses_total")
+    if cached is not None:
+        log.info(f"AI reply (cached): {cached}")
+        conversation.add("assistant", cached)
+        conversation_store.save(call_sid, conversation)
+        resp = VoiceResponse()
+        resp.say(("Tamil detected. " if has_tamil(cached) else "") + cached, voice="alice", language="en-IN")
+        finish_turn(resp, call_sid, should_end or has_end_word(cached))
+        return Response(str(resp), mimetype="text/xml")
+
+    reply_id = uuid.uuid4().hex
+    pending_replies.publish(reply_id, [], False, should_end)
+    threading.Thread(
+        target=stream_reply,
+        args=(call_sid, conversation, context, speech_result, reply_id, should_end),
+        daemon=True,
+    ).start()
+
+    state = pending_replies.wait(reply_id, 0, FIRST_SENTENCE_TIMEOUT)
+    twiml = streamed_twiml(call_sid, reply_id, state, 0)
+    metrics.observe("gather_first_twiml_ms", (time.monotonic() - started) * 1000)
+    return twiml
+
+
+@app.route("/gather/continue", methods=["POST"])
+def gather_continue():
+    call_sid = request.form.get("CallSid")
+    reply_id = request.args.get("rid", "")
+    said = int(request.args.get("n", 0))
+    state = pending_replies.wait(reply_id, said, CONTINUE_TIMEOUT)
+    return streamed_twiml(call_sid, reply_id, state, said)
+
+
+def streamed_twiml(call_sid, reply_id, state, said):
+    """Say the sentences not spoken yet, then either keep streaming or finish the turn."""
+    resp = VoiceResponse()
+    if state is None:
+        resp.say("Sorry, I lost my train of thought.", voice="alice", language="en-IN")
+        finish_turn(resp, call_sid, False)
+        return Response(str(resp), mimetype="text/xml")
+
+    if not state["done"] and len(state["sentences"]) <= said:
+        # Nothing new within the timeout: the worker streaming this reply hung or died
+        log.info(f"⚠️ Streamed reply {reply_id} stalled after {said} sentences")
+        pending_replies.discard(reply_id)
+        resp.say(FALLBACK_REPLY, voice="alice", language="en-IN")
+        finish_turn(resp, call_sid, False)
+        return Response(str(resp), mimetype="text/xml")
+
+    for sentence in state["sentences"][said:]:
+        resp.say(sentence, voice="alice", language="en-IN")
+
+    if state["done"]:
+        pending_replies.discard(reply_id)
+        finish_turn(resp, call_sid, state["should_end"])
+    else:
+        resp.redirect(
+            f"{PUBLIC_URL}/gather/continue?rid={reply_id}&n={len(state['sentences'])}",
+            method="POST"
+        )
     return Response(str(resp), mimetype="text/xml")
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     print(f"🚀 Running on {HOST}:{PORT}")
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_campaign_dialer()  # the debug reloader's child is the process that serves
     app.run(host=HOST, port=PORT, debug=True)
\ No newline at end of file
@@ -0,0 +1,222 @@
+import os
+import time
+import base64
+import json
+from collections import deque
+import numpy as np
+
+# ---------------------------------------------------------------------
+# 🔧 Audio formats
+# ---------------------------------------------------------------------
+# Twilio Media Streams: 8 kHz mono G.711 μ-law, 20 ms (160 byte) frames
+# OpenAI Realtime:      24 kHz mono PCM16 little-endian
+TWILIO_RATE = 8000
+OPENAI_RATE = 24000
+RESAMPLE_FACTOR = OPENAI_RATE // TWILIO_RATE
+
+# How much inbound audio to batch into one `input_audio_buffer.append`
+AUDIO_CHUNK_MS = int(os.getenv("AUDIO_CHUNK_MS", 100))
+
+
+# ---------------------------------------------------------------------
+# 🎚️ G.711 μ-law <-> PCM16 (lookup tables, no per-sample Python)
+# ---------------------------------------------------------------------
+def _build_ulaw_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    sample = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(sign != 0, -sample, sample).astype(np.int16)
+
+
+def _build_ulaw_encode_table():
+    # Indexed by the uint16 bit pattern of every possible int16 sample
+    x = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    sign = np.where(x < 0, 0x80, 0)
+    mag = np.minimum(np.abs(x), 32635) + 0x84
+    exponent = np.clip(np.floor(np.log2(mag)).astype(np.int32) - 7, 0, 7)
+    mantissa = (mag >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+ULAW_DECODE = _build_ulaw_decode_table()
+ULAW_ENCODE = _build_ulaw_encode_table()
+
+
+def ulaw_to_pcm16(ulaw):
+    """μ-law bytes -> int16 samples."""
+    return ULAW_DECODE[np.frombuffer(ulaw, dtype=np.uint8)]
+
+
+def pcm16_to_ulaw(pcm):
+    """int16 samples (array or little-endian bytes) -> μ-law bytes."""
+    if not isinstance(pcm, np.ndarray):
+        pcm = np.frombuffer(pcm, dtype="<i2")
+    return ULAW_ENCODE[pcm.view(np.uint16)].tobytes()
+
+
+def payload_bytes(payload):
+    """Decoded size of a base64 payload, without decoding it."""
+    return len(payload) * 3 // 4 - payload[-2:].count("=")
+
+
+# ---------------------------------------------------------------------
+# 🔀 Streaming 8 kHz <-> 24 kHz resampling
+# ---------------------------------------------------------------------
+def _lowpass_taps(num_taps=31, cutoff=3400 / OPENAI_RATE):
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class Upsampler:
+    """8 kHz -> 24 kHz linear interpolation, carrying the last sample across chunks."""
+
+    def __init__(self):
+        self.weights = (np.arange(1, RESAMPLE_FACTOR + 1, dtype=np.float32) / RESAMPLE_FACTOR)
+        self.last = np.float32(0)
+        self._prev = np.empty(0, dtype=np.float32)
+        self._out = np.empty((0, RESAMPLE_FACTOR), dtype=np.float32)
+
+    def _ensure(self, n):
+        if len(self._prev) < n:
+            self._prev = np.empty(n, dtype=np.float32)
+            self._out = np.empty((n, RESAMPLE_FACTOR), dtype=np.float32)
+
+    def process(self, pcm):
+        n = len(pcm)
+        if n == 0:
+            return np.empty(0, dtype=np.int16)
+        self._ensure(n)
+        prev = self._prev[:n]
+        prev[0] = self.last
+        prev[1:] = pcm[:-1]
+        out = self._out[:n]
+        # y[3i + k] = prev + (x - prev) * (k + 1) / 3
+        np.multiply((pcm - prev)[:, None], self.weights[None, :], out=out)
+        out += prev[:, None]
+        self.last = np.float32(pcm[-1])
+        return out.reshape(-1).astype(np.int16)
+
+
+class Downsampler:
+    """24 kHz -> 8 kHz: FIR low-pass + decimation, with filter history and phase kept across chunks."""
+
+    def __init__(self):
+        self.taps = _lowpass_taps()
+        self.history = np.zeros(len(self.taps) - 1, dtype=np.float32)
+        self.phase = 0
+        self._buf = np.empty(0, dtype=np.float32)
+
+    def process(self, pcm):
+        n = len(pcm)
+        if n == 0:
+            return np.empty(0, dtype=np.int16)
+        h = len(self.history)
+        if len(self._buf) < n + h:
+            self._buf = np.empty(n + h, dtype=np.float32)
+        buf = self._buf[:n + h]
+        buf[:h] = self.history
+        buf[h:] = pcm
+        filtered = np.convolve(buf, self.taps, mode="valid")
+        out = filtered[self.phase::RESAMPLE_FACTOR]
+        self.phase = (self.phase - n) % RESAMPLE_FACTOR
+        self.history[:] = buf[n:]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+# ---------------------------------------------------------------------
+# 🔁 Twilio <-> OpenAI event translation
+# ---------------------------------------------------------------------
+class TwilioRealtimeTranslator:
+    """
+    Per-call translation between Twilio Media Stream messages and OpenAI
+    Realtime events. Inbound 20 ms frames are coalesced into `chunk_ms`
+    chunks so each append event carries more audio.
+
+    With a `vad` only voiced audio is forwarded; with `commit_on_end_of_turn`
+    the translator also commits the input buffer when the VAD ends a turn.
+    """
+
+    def __init__(self, chunk_ms=AUDIO_CHUNK_MS, vad=None, commit_on_end_of_turn=False):
+        self.stream_sid = None
+        self.vad = vad
+        self.commit_on_end_of_turn = commit_on_end_of_turn
+        self.chunk_bytes = max(1, TWILIO_RATE * chunk_ms // 1000)  # 1 μ-law byte per sample
+        self.pending = bytearray()
+        self.input_ms = 0.0  # audio appended to the Realtime input buffer so far
+        self.input_log = deque(maxlen=600)  # (input_ms at the end of a chunk, when it was flushed)
+        self.upsampler = Upsampler()
+        self.downsampler = Downsampler()
+
+    # --- Twilio -> OpenAI ---
+    def from_twilio(self, msg):
+        """Translate one Twilio message into zero or more Realtime events."""
+        data = msg if isinstance(msg, dict) else json.loads(msg)
+        event = data.get("event")
+
+        if event == "start":
+            self.stream_sid = data["start"]["streamSid"]
+        elif event == "media":
+            return self._media(base64.b64decode(data["media"]["payload"]))
+        elif event == "stop":
+            if self.pending:
+                return [self.flush_input()]
+        return []
+
+    def _media(self, ulaw):
+        end_of_turn = False
+        if self.vad:
+            ulaw, end_of_turn = self.vad.process(ulaw)
+
+        events = []
+        self.pending += ulaw
+        if len(self.pending) >= self.chunk_bytes or (end_of_turn and self.pending):
+            events.append(self.flush_input())
+        if end_of_turn and self.commit_on_end_of_turn:
+            events += [{"type": "input_audio_buffer.commit"}, {"type": "response.create"}]
+        return events
+
+    def flush_input(self):
+        """Emit everything buffered so far as one `input_audio_buffer.append`."""
+        pcm8k = ulaw_to_pcm16(bytes(self.pending)).astype(np.float32)
+        self.pending.clear()
+        self.input_ms += len(pcm8k) * 1000 / TWILIO_RATE
+        self.input_log.append((self.input_ms, time.monotonic()))
+        pcm24k = self.upsampler.process(pcm8k)
+        return {
+            "type": "input_audio_buffer.append",
+            "audio": base64.b64encode(pcm24k.astype("<i2").tobytes()).decode("ascii"),
+        }
+
+    def input_received_at(self, audio_ms):
+        """
+        Roughly when the audio `audio_ms` into the input buffer (the offset
+        server-VAD events report) arrived from Twilio; None if too old.
+        """
+        received_at = None
+        for end_ms, flushed_at in reversed(self.input_log):
+            if end_ms < audio_ms:
+                break
+            # Frames arrive in real time, so earlier audio in a chunk arrived earlier
+            received_at = flushed_at - (end_ms - audio_ms) / 1000
+        return received_at
+
+    # --- OpenAI -> Twilio ---
+    def from_openai(self, msg):
+        """Translate one Realtime event into zero or more Twilio messages."""
+        data = msg if isinstance(msg, dict) else json.loads(msg)
+        if data.get("type") == "response.audio.delta" and self.stream_sid:
+            return [self.media_frame(self.audio_delta_to_ulaw(data["delta"]))]
+        return []
+
+    def audio_delta_to_ulaw(self, delta):
+        pcm24k = np.frombuffer(base64.b64decode(delta), dtype="<i2").astype(np.float32)
+        return pcm16_to_ulaw(self.downsampler.process(pcm24k))
+
+    def media_frame(self, ulaw):
+        return self.payload_frame(base64.b64encode(ulaw).decode("ascii"))
+
+    def payload_frame(self, payload):
+        return {"event": "media", "streamSid": self.stream_sid, "media": {"payload": payload}}
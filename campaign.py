@@ -0,0 +1,277 @@
+import os
+import io
+import csv
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import get_logger
+
+# ---------------------------------------------------------------------
+# 🔧 Campaign configuration
+# ---------------------------------------------------------------------
+CAMPAIGN_CPS = float(os.getenv("CAMPAIGN_CPS", 1))                  # calls placed per second (Twilio's default CPS is 1)
+CAMPAIGN_MAX_LIVE = int(os.getenv("CAMPAIGN_MAX_LIVE", 20))         # dials in flight or connected at once
+CAMPAIGN_DIAL_WORKERS = int(os.getenv("CAMPAIGN_DIAL_WORKERS", 8))  # concurrent Twilio REST requests
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", 4))
+CAMPAIGN_BACKOFF = float(os.getenv("CAMPAIGN_BACKOFF", 2))          # seconds, doubled per retry
+CAMPAIGN_LIVE_TIMEOUT = float(os.getenv("CAMPAIGN_LIVE_TIMEOUT", 3600))  # live calls without a callback this long stop counting
+
+LIVE_STATES = ("placing", "dialing", "queued-at-twilio", "initiated", "ringing", "in-progress")
+TERMINAL_STATES = ("completed", "busy", "failed", "no-answer", "canceled")
+STATUS_CALLBACK_EVENTS = ["initiated", "ringing", "answered", "completed"]
+
+log = get_logger()
+
+
+def is_transient(exc):
+    """Rate limits, Twilio 5xx and network errors are worth retrying."""
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+def parse_numbers(text):
+    """
+    Numbers from CSV text: a `to` / `number` / `phone` column if there is a
+    header, otherwise the first column. Plain one-per-line lists work too.
+    """
+    rows = [r for r in csv.reader(io.StringIO(text)) if r and r[0].strip()]
+    if not rows:
+        return []
+    header = [c.strip().lower() for c in rows[0]]
+    column = 0
+    for name in ("to", "number", "phone"):
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+    return [r[column].strip() for r in rows if len(r) > column and r[column].strip()]
+
+
+class CampaignDialer:
+    """
+    Bulk outbound dialer backed by a SQLite queue.
+
+    A dispatcher thread hands due numbers to a bounded pool of dial workers,
+    pacing them to `calls_per_second` and keeping at most `max_live` calls in
+    flight. Twilio status callbacks (`on_status`) free capacity as calls end.
+    Claims happen in `BEGIN IMMEDIATE` transactions, so several worker
+    processes can share one database without double-dialing, and a restart
+    resumes wherever the queue left off.
+
+    `place_call(to, status_callback_url) -> call_sid` does the actual dial.
+    """
+
+    def __init__(self, place_call, status_callback_url, path, calls_per_second=CAMPAIGN_CPS,
+                 max_live=CAMPAIGN_MAX_LIVE, dial_workers=CAMPAIGN_DIAL_WORKERS,
+                 max_attempts=CAMPAIGN_MAX_ATTEMPTS, backoff=CAMPAIGN_BACKOFF, live_timeout=CAMPAIGN_LIVE_TIMEOUT):
+        self.place_call = place_call
+        self.status_callback_url = status_callback_url
+        self.interval = 1.0 / calls_per_second
+        self.max_live = max_live
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.live_timeout = live_timeout
+        self.executor = ThreadPoolExecutor(max_workers=dial_workers, thread_name_prefix="dial")
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dials (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                campaign_id INTEGER NOT NULL,
+                number TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                call_sid TEXT,
+                sequence INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dials_due ON dials (status, next_attempt);
+            CREATE INDEX IF NOT EXISTS dials_campaign ON dials (campaign_id, status);
+            CREATE UNIQUE INDEX IF NOT EXISTS dials_call_sid ON dials (call_sid);
+            CREATE TABLE IF NOT EXISTS pacing (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                next_slot REAL NOT NULL
+            );
+            INSERT OR IGNORE INTO pacing (id, next_slot) VALUES (1, 0);
+        """)
+        if "sequence" not in [c[1] for c in self.db.execute("PRAGMA table_info(dials)")]:
+            self.db.execute("ALTER TABLE dials ADD COLUMN sequence INTEGER")  # databases from before it existed
+        self.thread = None
+
+    # --- Lifecycle ---
+    def start(self):
+        # A dial that was mid-request when the process died never got a CallSid; queue it again
+        self._execute(
+            "UPDATE dials SET status = 'queued', updated = ? WHERE status = 'placing' AND updated < ?",
+            (time.time(), time.time() - 60),
+        )
+        self.thread = threading.Thread(target=self._dispatch, name="campaign-dispatcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        self.executor.shutdown(wait=True)
+
+    # --- API ---
+    def create(self, numbers):
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                campaign_id = self.db.execute("INSERT INTO campaigns (created) VALUES (?)", (now,)).lastrowid
+                self.db.executemany(
+                    "INSERT INTO dials (campaign_id, number, updated) VALUES (?, ?, ?)",
+                    [(campaign_id, n, now) for n in numbers],
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        self.wake.set()
+        log.info(f"📋 Campaign {campaign_id} queued {len(numbers)} numbers")
+        return campaign_id
+
+    def progress(self, campaign_id):
+        with self.lock:
+            created = self.db.execute("SELECT created FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+            if not created:
+                return None
+            counts = dict(self.db.execute(
+                "SELECT status, COUNT(*) FROM dials WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+            ).fetchall())
+        total = sum(counts.values())
+        finished = sum(counts.get(s, 0) for s in TERMINAL_STATES)
+        return {
+            "id": campaign_id,
+            "created": created[0],
+            "total": total,
+            "finished": finished,
+            "done": finished == total,
+            "statuses": counts,
+        }
+
+    def on_status(self, call_sid, call_status, sequence=None):
+        """
+        Twilio status callback: record the call's state and free capacity when
+        it ends. Callbacks can arrive out of order, so one older than the last
+        applied (`SequenceNumber`) is dropped, and a finished call never goes
+        back to a live state.
+        """
+        if call_status == "queued":
+            call_status = "queued-at-twilio"  # Twilio's queue, not ours
+        sequence = int(sequence) if sequence not in (None, "") else None
+        self._execute(
+            f"UPDATE dials SET status = ?, sequence = COALESCE(?, sequence), updated = ?"
+            f" WHERE call_sid = ? AND status NOT IN ({','.join('?' * len(TERMINAL_STATES))})"
+            " AND (? IS NULL OR sequence IS NULL OR sequence < ?)",
+            (call_status, sequence, time.time(), call_sid, *TERMINAL_STATES, sequence, sequence),
+        )
+        if call_status in TERMINAL_STATES:
+            self.wake.set()
+
+    # --- Dispatching ---
+    def _execute(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params)
+
+    def _claim_next(self):
+        """Claim one due number if capacity and pacing allow; else return how long to wait."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                live = self.db.execute(
+                    f"SELECT COUNT(*) FROM dials WHERE status IN ({','.join('?' * len(LIVE_STATES))}) AND updated >= ?",
+                    (*LIVE_STATES, now - self.live_timeout),
+                ).fetchone()[0]
+                if live >= self.max_live:
+                    self.db.execute("COMMIT")
+                    return None, 1.0
+                next_slot = self.db.execute("SELECT next_slot FROM pacing WHERE id = 1").fetchone()[0]
+                if next_slot > now:
+                    self.db.execute("COMMIT")
+                    return None, next_slot - now
+                row = self.db.execute(
+                    "SELECT id, number, attempts FROM dials WHERE status = 'queued' AND next_attempt <= ?"
+                    " ORDER BY next_attempt, id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if not row:
+                    due = self.db.execute("SELECT MIN(next_attempt) FROM dials WHERE status = 'queued'").fetchone()[0]
+                    self.db.execute("COMMIT")
+                    return None, min(max(due - now, 0.05), 1.0) if due else 1.0
+                self.db.execute(
+                    "UPDATE dials SET status = 'placing', attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (now, row[0]),
+                )
+                self.db.execute("UPDATE pacing SET next_slot = ? WHERE id = 1", (max(now, next_slot) + self.interval,))
+                self.db.execute("COMMIT")
+                return row, 0
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def _dispatch(self):
+        while not self.stopped.is_set():
+            try:
+                row, wait = self._claim_next()
+            except sqlite3.Error as e:
+                log.info(f"⚠️ Campaign queue error: {e}")
+                row, wait = None, 1.0
+            if row:
+                self.executor.submit(self._dial, *row)
+                continue
+            self.wake.wait(wait)
+            self.wake.clear()
+
+    def _dial(self, dial_id, number, attempts):
+        try:
+            call_sid = self.place_call(number, self.status_callback_url)
+            self._execute(
+                "UPDATE dials SET status = 'dialing', call_sid = ?, last_error = NULL, updated = ? WHERE id = ?",
+                (call_sid, time.time(), dial_id),
+            )
+            return
+        except Exception as e:
+            error = str(e)
+            retry = is_transient(e) and attempts + 1 < self.max_attempts
+
+        if retry:
+            delay = self.backoff * 2 ** attempts * random.uniform(0.8, 1.2)
+            log.info(f"🔁 Dial to {number} failed ({error}); retrying in {delay:.1f}s")
+            self._execute(
+                "UPDATE dials SET status = 'queued', sequence = NULL, next_attempt = ?, last_error = ?, updated = ? WHERE id = ?",
+                (time.time() + delay, error, time.time(), dial_id),
+            )
+        else:
+            log.info(f"❌ Dial to {number} failed: {error}")
+            self._execute(
+                "UPDATE dials SET status = 'failed', last_error = ?, updated = ? WHERE id = ?",
+                (error, time.time(), dial_id),
+            )
+        self.wake.set()
+
+
+def numbers_from_request(form, files, json_body):
+    """Collect numbers from a CSV upload (`file`), a `numbers` form field or a JSON body."""
+    if files and "file" in files:
+        return parse_numbers(files["file"].read().decode("utf-8-sig"))
+    if form and form.get("numbers"):
+        return parse_numbers(form["numbers"].replace(",", "\n"))
+    if json_body:
+        return [str(n).strip() for n in json_body.get("numbers", []) if str(n).strip()]
+    return []
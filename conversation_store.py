@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------------------------------------------------------------
+# 🔧 Store configuration
+# ---------------------------------------------------------------------
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory")        # "memory" or "sqlite"
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "conversations.db")
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", 3600))             # seconds since the last turn
+CONVERSATION_MAX_CALLS = int(os.getenv("CONVERSATION_MAX_CALLS", 10000))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", 50 * 1024 * 1024))
+CONVERSATION_EVICT_INTERVAL = float(os.getenv("CONVERSATION_EVICT_INTERVAL", 10))  # seconds between SQLite cap checks
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))
+HISTORY_SUMMARIZE = os.getenv("HISTORY_SUMMARIZE", "1") == "1"
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", 2))  # background summary threads
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting short voice turns
+    return len(text) // 4 + 4
+
+
+class Conversation:
+    """One call's history: a rolling summary of old turns plus the recent ones."""
+
+    def __init__(self, turns=None, summary=""):
+        self.turns = turns or []
+        self.summary = summary
+
+    def add(self, role, content):
+        self.turns.append({"role": role, "content": content})
+
+    def messages(self):
+        summary = []
+        if self.summary:
+            summary = [{"role": "system", "content": f"Summary of the call so far: {self.summary}"}]
+        return summary + self.turns
+
+    def trim(self, budget):
+        """Drop the oldest turns until the history fits `budget` tokens; returns them."""
+        used = estimate_tokens(self.summary) + sum(estimate_tokens(t["content"]) for t in self.turns)
+        dropped = []
+        while self.turns and used > budget and len(self.turns) > 1:
+            turn = self.turns.pop(0)
+            used -= estimate_tokens(turn["content"])
+            dropped.append(turn)
+        return dropped
+
+    def dumps(self):
+        return json.dumps({"turns": self.turns, "summary": self.summary}, ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, raw):
+        data = json.loads(raw)
+        return cls(data.get("turns"), data.get("summary", ""))
+
+
+# ---------------------------------------------------------------------
+# 💾 Backends (store serialized conversations keyed by CallSid)
+# ---------------------------------------------------------------------
+class MemoryBackend:
+    """In-process LRU with TTL, a call-count cap and a total-bytes cap."""
+
+    def __init__(self, ttl=CONVERSATION_TTL, max_calls=CONVERSATION_MAX_CALLS, max_bytes=CONVERSATION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_calls = max_calls
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()  # call_sid -> (raw, updated)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, call_sid):
+        with self.lock:
+            entry = self.items.get(call_sid)
+            if not entry:
+                return None
+            if time.time() - entry[1] > self.ttl:
+                self._remove(call_sid)
+                return None
+            self.items.move_to_end(call_sid)
+            return entry[0]
+
+    def put(self, call_sid, raw):
+        with self.lock:
+            if call_sid in self.items:
+                self._remove(call_sid)
+            self.items[call_sid] = (raw, time.time())
+            self.bytes += len(raw)
+            self._evict()
+
+    def delete(self, call_sid):
+        with self.lock:
+            if call_sid in self.items:
+                self._remove(call_sid)
+
+    def _remove(self, call_sid):
+        raw, _ = self.items.pop(call_sid)
+        self.bytes -= len(raw)
+
+    def _evict(self):
+        now = time.time()
+        # Oldest first: expired entries, then least-recently-used ones over the caps
+        while self.items:
+            call_sid, (_, updated) = next(iter(self.items.items()))
+            over = len(self.items) > self.max_calls or self.bytes > self.max_bytes
+            if not over and now - updated <= self.ttl:
+                break
+            self._remove(call_sid)
+
+
+class SQLiteBackend:
+    """
+    SQLite file shared by every worker on the box, so any gunicorn worker
+    can serve any CallSid without sticky routing.
+
+    Reads never write. Expired rows are ignored on read and, like the
+    count/size caps, enforced every `evict_interval` seconds rather than on
+    every put, which would scan the whole table per write.
+    """
+
+    def __init__(self, path=CONVERSATION_DB, ttl=CONVERSATION_TTL, max_calls=CONVERSATION_MAX_CALLS,
+                 max_bytes=CONVERSATION_MAX_BYTES, evict_interval=CONVERSATION_EVICT_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.max_calls = max_calls
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.next_evict = 0.0
+        self.evict_lock = threading.Lock()
+        self.local = threading.local()
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " call_sid TEXT PRIMARY KEY, raw TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db().execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated)")
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def get(self, call_sid):
+        row = self._db().execute(
+            "SELECT raw FROM conversations WHERE call_sid = ? AND updated >= ?",
+            (call_sid, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, call_sid, raw):
+        db = self._db()
+        db.execute(
+            "INSERT INTO conversations (call_sid, raw, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(call_sid) DO UPDATE SET raw = excluded.raw, updated = excluded.updated",
+            (call_sid, raw, time.time()),
+        )
+        if time.monotonic() >= self.next_evict and self.evict_lock.acquire(blocking=False):
+            try:
+                self.next_evict = time.monotonic() + self.evict_interval
+                self._evict(db)
+            finally:
+                self.evict_lock.release()
+
+    def delete(self, call_sid):
+        self._db().execute("DELETE FROM conversations WHERE call_sid = ?", (call_sid,))
+
+    def _evict(self, db):
+        db.execute("DELETE FROM conversations WHERE updated < ?", (time.time() - self.ttl,))
+        count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(raw)), 0) FROM conversations").fetchone()
+        if count <= self.max_calls and size <= self.max_bytes:
+            return
+        # Least recently used first, until both caps hold
+        rows = db.execute("SELECT call_sid, LENGTH(raw) FROM conversations ORDER BY updated").fetchall()
+        doomed = []
+        for call_sid, length in rows:
+            if count <= self.max_calls and size <= self.max_bytes:
+                break
+            doomed.append((call_sid,))
+            count -= 1
+            size -= length
+        db.executemany("DELETE FROM conversations WHERE call_sid = ?", doomed)
+
+
+# ---------------------------------------------------------------------
+# 🗂️ Store
+# ---------------------------------------------------------------------
+class ConversationStore:
+    """
+    Saves trim each call's history to `token_budget`. With
+    `summarize(summary, dropped_turns) -> str` the dropped turns are folded
+    into the rolling summary on a background thread, so a webhook never
+    waits on the summary model. The summary is stored under its own key so
+    a turn saved meanwhile can't overwrite it.
+    """
+
+    def __init__(self, backend, token_budget=HISTORY_TOKEN_BUDGET, summarize=None,
+                 summary_workers=HISTORY_SUMMARY_WORKERS):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summarizer = None
+        if summarize:
+            self.summarizer = ThreadPoolExecutor(max_workers=summary_workers, thread_name_prefix="summary")
+        self.lock = threading.Lock()
+        self.unsummarized = {}  # call_sid -> dropped turns for the fold already running for that call
+
+    @staticmethod
+    def _summary_key(call_sid):
+        return f"summary:{call_sid}"
+
+    def load(self, call_sid):
+        raw = self.backend.get(call_sid)
+        conversation = Conversation.loads(raw) if raw else Conversation()
+        summary = self.backend.get(self._summary_key(call_sid))
+        if summary is not None:
+            conversation.summary = summary
+        return conversation
+
+    def save(self, call_sid, conversation):
+        dropped = conversation.trim(self.token_budget)
+        self.backend.put(call_sid, conversation.dumps())
+        if not (dropped and self.summarizer):
+            return
+        with self.lock:
+            running = call_sid in self.unsummarized
+            self.unsummarized.setdefault(call_sid, []).extend(dropped)
+        if not running:
+            self.summarizer.submit(self._fold, call_sid)
+
+    def _fold(self, call_sid):
+        # One fold per call at a time, so turns reach the summary in order
+        key = self._summary_key(call_sid)
+        while True:
+            with self.lock:
+                dropped = self.unsummarized.get(call_sid)
+                if not dropped:
+                    self.unsummarized.pop(call_sid, None)
+                    return
+                self.unsummarized[call_sid] = []
+            try:
+                summary = self.summarize(self.backend.get(key) or "", dropped)
+                if summary and self.backend.get(call_sid) is not None:  # skip calls that have ended
+                    self.backend.put(key, summary)
+            except Exception:
+                with self.lock:
+                    self.unsummarized.pop(call_sid, None)
+                raise
+
+    def delete(self, call_sid):
+        self.backend.delete(call_sid)
+        self.backend.delete(self._summary_key(call_sid))
+
+
+def make_backend(name=CONVERSATION_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown CONVERSATION_BACKEND: {name}")
@@ -0,0 +1,122 @@
+import os
+import json
+import base64
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+import websockets
+
+# ---------------------------------------------------------------------
+# 🧪 Local stand-in for the OpenAI Realtime API
+# ---------------------------------------------------------------------
+# Speaks just enough of the protocol to exercise the bridge offline:
+#   session.update   -> session.updated
+#   response.create  -> a transcript and a short 440 Hz tone as response.audio.delta events
+#   input_audio_buffer.append during a response -> input_audio_buffer.speech_started (server VAD)
+#   response.cancel  -> stops the audio and reports the response as cancelled
+# Point the agent at it with OPENAI_REALTIME_URL=ws://127.0.0.1:8765
+
+SAMPLE_RATE = 24000
+DELTA_MS = 100
+
+
+def tone_deltas(duration_ms=600, freq=440):
+    t = np.arange(SAMPLE_RATE * duration_ms // 1000) / SAMPLE_RATE
+    pcm = (6000 * np.sin(2 * np.pi * freq * t)).astype("<i2")
+    step = SAMPLE_RATE * DELTA_MS // 1000
+    return [base64.b64encode(pcm[i:i + step].tobytes()).decode("ascii") for i in range(0, len(pcm), step)]
+
+
+class FakeRealtimeServer:
+    def __init__(self, host="127.0.0.1", port=8765, connect_delay=0.0, response_delay=0.0,
+                 delta_interval=0.0, tone_ms=600, server_vad=True):
+        self.host = host
+        self.port = port
+        self.connect_delay = connect_delay      # simulated handshake/session setup time
+        self.response_delay = response_delay    # simulated model time-to-first-audio
+        self.delta_interval = delta_interval    # pause between audio deltas
+        self.deltas = tone_deltas(tone_ms)
+        self.server_vad = server_vad            # any input during a response counts as speech_started
+        self.received = deque(maxlen=1000)  # recent client events, for assertions
+        self._server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await websockets.serve(self.handler, self.host, self.port)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def handler(self, ws):
+        await asyncio.sleep(self.connect_delay)
+        await ws.send(json.dumps({"type": "session.created", "session": {}}))
+        state = {"response": None, "count": 0, "input_ms": 0.0}
+        async for msg in ws:
+            event = json.loads(msg)
+            self.received.append(event)
+            kind = event.get("type")
+            if kind == "session.update":
+                await ws.send(json.dumps({"type": "session.updated", "session": event.get("session", {})}))
+            elif kind == "response.create":
+                asyncio.create_task(self.respond(ws, state))
+            elif kind == "response.cancel":
+                state["response"] = None
+            elif kind == "input_audio_buffer.append":
+                audio_ms = len(base64.b64decode(event["audio"])) / 2 * 1000 / SAMPLE_RATE
+                if state["response"] and self.server_vad:
+                    await ws.send(json.dumps({
+                        "type": "input_audio_buffer.speech_started", "audio_start_ms": int(state["input_ms"])
+                    }))
+                state["input_ms"] += audio_ms
+
+    async def respond(self, ws, state):
+        await asyncio.sleep(self.response_delay)
+        state["count"] += 1
+        response_id = f"resp_{state['count']}"
+        item_id = f"item_{state['count']}"
+        state["response"] = response_id
+        status = "completed"
+        try:
+            await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+            await ws.send(json.dumps({"type": "response.audio_transcript.delta", "delta": "Hello from the fake server."}))
+            for delta in self.deltas:
+                if state["response"] != response_id:
+                    status = "cancelled"
+                    break
+                await ws.send(json.dumps({
+                    "type": "response.audio.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "delta": delta,
+                }))
+                await asyncio.sleep(self.delta_interval)
+            if state["response"] == response_id:
+                state["response"] = None
+            await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id, "status": status}}))
+        except websockets.ConnectionClosed:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI Realtime server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_REALTIME_PORT", 8765)))
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--response-delay", type=float, default=0.0)
+    parser.add_argument("--delta-interval", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def main():
+        server = await FakeRealtimeServer(
+            args.host, args.port, args.connect_delay, args.response_delay, args.delta_interval
+        ).start()
+        print(f"🧪 Fake Realtime server on {server.url}")
+        await asyncio.Future()
+
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+import os
+import json
+import mmap
+import base64
+import asyncio
+import hashlib
+from metrics import get_logger
+
+# ---------------------------------------------------------------------
+# 🔧 Cache configuration
+# ---------------------------------------------------------------------
+GREETING_CACHE_DIR = os.getenv("GREETING_CACHE_DIR", ".cache/greetings")
+GREETING_FRAME_BYTES = 800  # 100 ms of 8 kHz μ-law per Twilio media message
+
+log = get_logger()
+
+
+def greeting_key(instructions, voice, language):
+    """Cache key: any change to the prompt, voice or language yields a new key."""
+    raw = json.dumps([instructions, voice, language], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class CachedGreeting:
+    def __init__(self, ulaw, transcript, frame_bytes=GREETING_FRAME_BYTES):
+        self.transcript = transcript
+        self.mtime = None  # of the on-disk copy; None until it has been written
+        # Base64 payloads are ready to drop into Twilio `media` frames
+        self.payloads = [
+            base64.b64encode(ulaw[i:i + frame_bytes]).decode("ascii")
+            for i in range(0, len(ulaw), frame_bytes)
+        ]
+
+
+class GreetingCache:
+    """
+    Greeting audio as Twilio μ-law, kept in memory and on disk.
+
+    On disk each entry is `<key>.ulaw` (raw μ-law, mmap'd on load) plus
+    `<key>.json` with the transcript the model spoke.
+    """
+
+    def __init__(self, directory=GREETING_CACHE_DIR):
+        self.directory = directory
+        self.entries = {}
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".ulaw", base + ".json"
+
+    def get(self, key):
+        """
+        Entry from memory, as long as its file on disk is unchanged. Another
+        worker may have invalidated or re-recorded it since we loaded it.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return self.load(key)
+        if entry.mtime is None:
+            return entry
+        try:
+            mtime = os.stat(self._paths(key)[1]).st_mtime_ns
+        except OSError:
+            self.entries.pop(key, None)
+            return None
+        return entry if mtime == entry.mtime else self.load(key)
+
+    def load(self, key):
+        """Pull an entry from disk into memory; returns None on a miss."""
+        audio_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                meta = json.load(f)
+            with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                entry = CachedGreeting(m, meta.get("transcript", ""))
+        except (OSError, ValueError):
+            self.entries.pop(key, None)
+            return None
+        entry.mtime = mtime
+        self.entries[key] = entry
+        return self.entries[key]
+
+    def put(self, key, ulaw, transcript):
+        """Store in memory now; write to disk on a worker thread."""
+        entry = self.entries[key] = CachedGreeting(ulaw, transcript)
+        return asyncio.get_running_loop().run_in_executor(None, self._write, key, ulaw, transcript, entry)
+
+    def _write(self, key, ulaw, transcript, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        audio_path, meta_path = self._paths(key)
+        for path, data in ((audio_path, ulaw),
+                           (meta_path, json.dumps({"transcript": transcript}, ensure_ascii=False).encode("utf-8"))):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        entry.mtime = os.stat(meta_path).st_mtime_ns
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when `key` is None."""
+        keys = [key] if key else list(self.entries) + self._disk_keys()
+        for k in set(keys):
+            self.entries.pop(k, None)
+            for path in self._paths(k):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def prune(self, keep):
+        """Remove entries for prompts that are no longer in use."""
+        for k in set(self._disk_keys()) | set(self.entries):
+            if k not in keep:
+                self.invalidate(k)
+
+    def _disk_keys(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [n[:-len(".json")] for n in names if n.endswith(".json")]
+
+
+class GreetingRecorder:
+    """Captures the first response of a call so later calls can replay it."""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.audio = bytearray()
+        self.transcript = []
+        self.done = False
+
+    def feed(self, event, frames):
+        if self.done:
+            return
+        kind = event.get("type")
+        if kind == "response.audio.delta":
+            for frame in frames:
+                self.audio += base64.b64decode(frame["media"]["payload"])
+        elif kind == "response.audio_transcript.delta":
+            self.transcript.append(event.get("delta", ""))
+        elif kind == "response.done":
+            self.done = True
+            # Don't cache a greeting that was cut short or failed
+            if event.get("response", {}).get("status", "completed") == "completed" and self.audio:
+                self.cache.put(self.key, bytes(self.audio), "".join(self.transcript))
+                log.info("💾 Greeting audio cached")
@@ -0,0 +1,10 @@
+import sys
+
+# Picked up automatically by `gunicorn app:app` run from this directory.
+
+
+def post_worker_init(worker):
+    # Start each worker's campaign dialer at boot, after any --preload fork
+    app = sys.modules.get("app")
+    if app is not None and hasattr(app, "start_campaign_dialer"):
+        app.start_campaign_dialer()
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import wave
+import base64
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import websockets
+from audio_codec import pcm16_to_ulaw, TWILIO_RATE
+
+# ---------------------------------------------------------------------
+# 🏋️ Load harness for /twilio-stream
+# ---------------------------------------------------------------------
+# Replays μ-law audio as N simulated Twilio Media Streams against the realtime
+# agent, which talks to a local fake Realtime server, and reports latency
+# percentiles per concurrency level. Example:
+#   python loadtest.py --calls 10,50,100 --turns 3 --response-delay 0.3
+# or against an agent that is already running:
+#   python loadtest.py --url ws://127.0.0.1:10000/twilio-stream --calls 50
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz μ-law
+FRAME_S = 0.02
+SILENCE = b"\xff" * FRAME_BYTES
+
+
+def load_audio(path):
+    """Speech to replay: raw 8 kHz μ-law, or a 16-bit mono 8 kHz WAV; synthetic if no path."""
+    if not path:
+        t = np.arange(int(TWILIO_RATE * 1.2)) / TWILIO_RATE
+        voiced = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((180, 360, 540), 1))
+        envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)
+        return pcm16_to_ulaw((6000 * voiced * envelope).astype(np.int16))
+    if path.endswith(".wav"):
+        with wave.open(path) as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1 or w.getframerate() != TWILIO_RATE:
+                raise SystemExit("WAV input must be 16-bit mono 8 kHz")
+            return pcm16_to_ulaw(w.readframes(w.getnframes()))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def frames_of(audio):
+    audio += SILENCE[:(-len(audio)) % FRAME_BYTES]
+    return [base64.b64encode(audio[i:i + FRAME_BYTES]).decode("ascii") for i in range(0, len(audio), FRAME_BYTES)]
+
+
+class CallResult:
+    def __init__(self):
+        self.first_audio_ms = None
+        self.turn_ms = []
+        self.error = None
+
+
+async def simulated_call(url, call_no, speech, turns, silence_after, result):
+    """One Twilio leg: stream 20 ms frames, play back (and ack) agent audio in real time, speak `turns` times."""
+    silence = base64.b64encode(SILENCE).decode("ascii")
+    stream_sid = f"MZload{call_no:06d}"
+    state = {"playback_end": 0.0, "last_media": 0.0, "turn_end": None}
+    got_audio = asyncio.Event()
+
+    async def receive(ws):
+        async for msg in ws:
+            data = json.loads(msg)
+            now = time.monotonic()
+            if data.get("event") == "media":
+                if result.first_audio_ms is None:
+                    result.first_audio_ms = (now - started) * 1000
+                if state["turn_end"] is not None:
+                    result.turn_ms.append((now - state["turn_end"]) * 1000)
+                    state["turn_end"] = None
+                # Twilio plays frames back to back; marks are echoed when playback reaches them
+                size = len(base64.b64decode(data["media"]["payload"]))
+                state["playback_end"] = max(now, state["playback_end"]) + size / TWILIO_RATE
+                state["last_media"] = now
+                got_audio.set()
+            elif data.get("event") == "mark":
+                reply = json.dumps({"event": "mark", "streamSid": stream_sid, "mark": data["mark"]})
+                asyncio.ensure_future(ack_mark(ws, reply, state["playback_end"] - now))
+            elif data.get("event") == "clear":
+                state["playback_end"] = now
+
+    async def ack_mark(ws, reply, delay):
+        await asyncio.sleep(max(0.0, delay))
+        try:
+            await ws.send(reply)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send_frames(ws, payloads):
+        next_at = time.monotonic()
+        for payload in payloads:
+            await ws.send(json.dumps({"event": "media", "streamSid": stream_sid, "media": {"payload": payload}}))
+            next_at += FRAME_S
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    async def wait_for_agent_to_finish(ws):
+        # Keep sending silence while the agent talks, like a real phone line
+        while True:
+            await send_frames(ws, [silence] * 5)
+            now = time.monotonic()
+            if got_audio.is_set() and now >= state["playback_end"] and now - state["last_media"] > 0.3:
+                return
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            started = time.monotonic()
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await ws.send(json.dumps({
+                "event": "start",
+                "streamSid": stream_sid,
+                "start": {"streamSid": stream_sid, "callSid": f"CAload{call_no:06d}", "customParameters": {}},
+            }))
+            receiver = asyncio.create_task(receive(ws))
+            try:
+                await asyncio.wait_for(wait_for_agent_to_finish(ws), 30)
+                for _ in range(turns):
+                    got_audio.clear()
+                    await send_frames(ws, speech)
+                    state["turn_end"] = time.monotonic()
+                    await send_frames(ws, [silence] * silence_after)
+                    await asyncio.wait_for(wait_for_agent_to_finish(ws), 30)
+                await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+            finally:
+                receiver.cancel()
+    except Exception as e:
+        result.error = repr(e)
+
+
+def percentiles(values):
+    if not values:
+        return "      -       -       -"
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"{p50:7.0f} {p95:7.0f} {p99:7.0f}"
+
+
+async def run_level(url, calls, speech, turns, silence_after, ramp_seconds):
+    results = [CallResult() for _ in range(calls)]
+
+    async def staggered(i):
+        await asyncio.sleep(ramp_seconds * i / max(calls, 1))
+        await simulated_call(url, i, speech, turns, silence_after, results[i])
+
+    await asyncio.gather(*(staggered(i) for i in range(calls)))
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise SystemExit(f"Nothing listening on port {port}")
+
+
+def start_servers(args, workdir):
+    """Fake Realtime server + one agent worker process, both on free local ports."""
+    fake_port, agent_port = free_port(), free_port()
+    here = os.path.dirname(os.path.abspath(__file__))
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(here, "fake_realtime.py"), "--port", str(fake_port),
+        "--connect-delay", str(args.connect_delay), "--response-delay", str(args.response_delay),
+    ], stdout=subprocess.DEVNULL)
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-load-test",
+        OPENAI_REALTIME_URL=f"ws://127.0.0.1:{fake_port}",
+        GREETING_CACHE_DIR=os.path.join(workdir, "greetings"),
+        CAMPAIGN_DB=os.path.join(workdir, "campaigns.db"),
+        VAD_COMMIT=os.getenv("VAD_COMMIT", "1"),  # the fake server has no turn detection of its own
+    )
+    agent = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "realtime_agent:app", "--host", "127.0.0.1",
+        "--port", str(agent_port), "--workers", "1", "--log-level", "warning",
+    ], cwd=here, env=env, stderr=subprocess.DEVNULL if not args.verbose else None)
+    return [fake, agent], fake_port, agent_port
+
+
+async def main(args):
+    speech = frames_of(load_audio(args.audio))
+    levels = [int(n) for n in args.calls.split(",")]
+    processes = []
+    url = args.url
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if not url:
+                processes, fake_port, agent_port = start_servers(args, workdir)
+                await wait_for_port(fake_port)
+                await wait_for_port(agent_port)
+                url = f"ws://127.0.0.1:{agent_port}/twilio-stream"
+
+            print(f"🏋️ {url}  turns={args.turns}  speech={len(speech) * 20} ms  SLO p95 turn <= {args.slo_ms:.0f} ms\n")
+            print(f"{'calls':>6} {'errors':>6} | {'first audio p50/p95/p99 (ms)':>30} | {'turn p50/p95/p99 (ms)':>24}")
+            best = 0
+            for calls in levels:
+                results = await run_level(url, calls, speech, args.turns, args.silence_frames, args.ramp_seconds)
+                errors = [r.error for r in results if r.error]
+                first = [r.first_audio_ms for r in results if r.first_audio_ms is not None]
+                turn = [ms for r in results for ms in r.turn_ms]
+                print(f"{calls:>6} {len(errors):>6} | {percentiles(first):>30} | {percentiles(turn):>24}")
+                if errors and args.verbose:
+                    print("   first error:", errors[0])
+                if not errors and turn and np.percentile(turn, 95) <= args.slo_ms:
+                    best = calls
+            print(f"\nMax concurrent calls per process within SLO: {best or 'none of the tested levels'}")
+        finally:
+            for p in processes:
+                p.terminate()
+                p.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay μ-law audio as simulated Twilio streams against /twilio-stream")
+    parser.add_argument("--url", help="agent WebSocket URL; default starts a local agent and fake Realtime server")
+    parser.add_argument("--calls", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=2, help="caller turns per call")
+    parser.add_argument("--audio", help="caller speech: raw 8 kHz μ-law or 16-bit mono 8 kHz WAV")
+    parser.add_argument("--silence-frames", type=int, default=50, help="20 ms silent frames after each utterance")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="spread call starts over this long")
+    parser.add_argument("--connect-delay", type=float, default=0.2, help="fake Realtime handshake delay (s)")
+    parser.add_argument("--response-delay", type=float, default=0.3, help="fake Realtime time-to-first-audio (s)")
+    parser.add_argument("--slo-ms", type=float, default=1500, help="p95 turn latency that counts as keeping up")
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import queue
+import bisect
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Milliseconds; wide enough for frame timings and slow model turns
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+METRICS_DIR = os.getenv("METRICS_DIR")  # shared by a host's workers so /metrics covers all of them
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))  # seconds between snapshots
+
+
+# ---------------------------------------------------------------------
+# 🪵 Non-blocking logging
+# ---------------------------------------------------------------------
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    logger = logging.getLogger("agent")
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _listener = QueueListener(records, handler)
+    _listener.start()
+    for old in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(old)
+    logger.addHandler(QueueHandler(records))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def get_logger():
+    """
+    Logger whose records are handed to a queue and written to stderr by a
+    background thread, so the request path never blocks on I/O. Processes
+    forked after import (gunicorn --preload) get a writer thread of their own.
+    """
+    if _listener is None:
+        _start_listener()
+        os.register_at_fork(after_in_child=_start_listener)
+    return logging.getLogger("agent")
+
+
+def log_event(event, **fields):
+    """One structured JSON line, e.g. per-call timings."""
+    get_logger().info(json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
+
+
+# ---------------------------------------------------------------------
+# 📈 Histograms, counters, gauges
+# ---------------------------------------------------------------------
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Process-wide registry rendered in the Prometheus text format at `/metrics`.
+
+    With several worker processes behind one port a scrape reaches just one
+    of them. Give every worker the same `directory` (`METRICS_DIR`): each
+    then writes a snapshot there every `flush_interval` seconds, and
+    `render()` adds up its own live values and the other workers' snapshots.
+    """
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}  # name -> callable returning the current value
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            self._start_exporter()
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def observe(self, name, value):
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def snapshot(self):
+        with self.lock:
+            histograms = {
+                name: {"buckets": list(h.buckets), "counts": list(h.counts), "sum": h.sum, "count": h.count}
+                for name, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+        gauges = {name: fn() for name, fn in self.gauges.items()}
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def render(self):
+        total = self.snapshot()
+        for other in self._other_snapshots():
+            for name, hist in other["histograms"].items():
+                mine = total["histograms"].setdefault(name, {**hist, "counts": [0] * len(hist["counts"]),
+                                                             "sum": 0.0, "count": 0})
+                if mine["buckets"] != hist["buckets"]:
+                    continue
+                mine["counts"] = [a + b for a, b in zip(mine["counts"], hist["counts"])]
+                mine["sum"] += hist["sum"]
+                mine["count"] += hist["count"]
+            for kind in ("counters", "gauges"):
+                for name, value in other[kind].items():
+                    total[kind][name] = total[kind].get(name, 0) + value
+
+        lines = []
+        for name, hist in sorted(total["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(hist["buckets"], hist["counts"]):
+                cumulative += n
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {hist["count"]}')
+            lines.append(f"{name}_sum {hist['sum']:.3f}")
+            lines.append(f"{name}_count {hist['count']}")
+        for kind, type_ in (("counters", "counter"), ("gauges", "gauge")):
+            for name, value in sorted(total[kind].items()):
+                lines.append(f"# TYPE {name} {type_}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # --- Sharing between worker processes ---
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def _start_exporter(self):
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._export, name="metrics-exporter", daemon=True).start()
+
+    def _after_fork(self):
+        # A forked worker starts from zero and with its own exporter
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self._start_exporter()
+
+    def _export(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                tmp = self._path(pid) + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(tmp, self._path(pid))
+            except Exception as e:
+                get_logger().info(f"⚠️ Could not write metrics snapshot: {e}")
+
+    def _other_snapshots(self):
+        """Snapshots of the other live workers; files not refreshed lately belong to dead ones."""
+        if not self.directory:
+            return []
+        snapshots = []
+        mine = self._path(os.getpid())
+        stale_before = time.time() - 3 * self.flush_interval
+        for entry in os.scandir(self.directory):
+            if not (entry.name.startswith("metrics-") and entry.name.endswith(".json")) or entry.path == mine:
+                continue
+            try:
+                if entry.stat().st_mtime < stale_before:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+metrics = Metrics()
+
+
+class CallTimer:
+    """
+    Milestones of one call, measured from when Twilio connected. Each first
+    `mark()` of a stage is recorded into `<prefix>_<stage>_ms`.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.start = time.monotonic()
+        self.marks = {}
+
+    def elapsed_ms(self, since=None):
+        return (time.monotonic() - (self.start if since is None else since)) * 1000
+
+    def mark(self, stage):
+        if stage in self.marks:
+            return
+        self.marks[stage] = round(self.elapsed_ms(), 1)
+        metrics.observe(f"{self.prefix}_{stage}_ms", self.marks[stage])
@@ -0,0 +1,77 @@
+from collections import deque
+from audio_codec import TWILIO_RATE
+
+
+class PlaybackTracker:
+    """
+    Tracks how much assistant audio Twilio has actually played.
+
+    Every media frame sent to Twilio is followed by a `mark`; Twilio echoes
+    the mark back once the audio before it has played. On barge-in this
+    gives the `audio_end_ms` to truncate the assistant item to.
+    """
+
+    def __init__(self):
+        self.response_id = None
+        self.item_id = None
+        self.sent_ms = 0.0
+        self.played_ms = 0.0
+        self.marks = deque()  # (name, item_id, sent_ms at the end of the frame)
+        self.seq = 0
+        self.cancelled = deque(maxlen=8)  # responses whose late audio must not be played
+
+    @property
+    def playing(self):
+        return bool(self.marks)
+
+    def on_openai_event(self, event):
+        kind = event.get("type")
+        if kind == "response.created":
+            self.response_id = event.get("response", {}).get("id")
+        elif kind == "response.done":
+            self.response_id = None
+
+    def should_play(self, event):
+        return event.get("response_id") not in self.cancelled
+
+    def on_audio_sent(self, item_id, ulaw_bytes):
+        """Record a frame sent to Twilio; returns the mark name to send after it."""
+        if item_id != self.item_id:
+            self.item_id = item_id
+            self.sent_ms = 0.0
+            self.played_ms = 0.0
+        self.sent_ms += ulaw_bytes * 1000 / TWILIO_RATE
+        self.seq += 1
+        name = f"audio-{self.seq}"
+        self.marks.append((name, item_id, self.sent_ms))
+        return name
+
+    def on_mark(self, name):
+        # Marks cleared by a barge-in may still be echoed; they must not eat newer ones
+        if not any(mark == name for mark, _, _ in self.marks):
+            return
+        while self.marks:
+            mark, item_id, end_ms = self.marks.popleft()
+            if item_id == self.item_id:
+                self.played_ms = end_ms
+            if mark == name:
+                break
+
+    def interrupt(self):
+        """Forget queued audio; returns the Realtime events that stop and truncate it."""
+        events = []
+        if self.response_id:
+            events.append({"type": "response.cancel"})
+            self.cancelled.append(self.response_id)
+        if self.item_id and self.playing:
+            events.append({
+                "type": "conversation.item.truncate",
+                "item_id": self.item_id,
+                "content_index": 0,
+                "audio_end_ms": int(self.played_ms),
+            })
+        self.marks.clear()
+        self.response_id = None
+        self.item_id = None
+        self.sent_ms = self.played_ms = 0.0
+        return events
@@ -1,11 +1,18 @@
 import os
+import time
+import uuid
 import asyncio
 import json
-import websockets
-from flask import Flask, request, Response
-from flask_sock import Sock
+from quart import Quart, request, Response, websocket
 from dotenv import load_dotenv
 from twilio.rest import Client
+from audio_codec import TwilioRealtimeTranslator, payload_bytes
+from session_pool import RealtimeSessionPool
+from greeting_cache import GreetingCache, GreetingRecorder, greeting_key
+from vad import VoiceActivityDetector, VAD_ENABLED, VAD_COMMIT
+from playback import PlaybackTracker
+from campaign import CampaignDialer, STATUS_CALLBACK_EVENTS, TERMINAL_STATES, numbers_from_request
+from metrics import metrics, CallTimer, get_logger, log_event
 
 # ---------------------------------------------------------------------
 # 🔧 Configuration
@@ -17,100 +24,394 @@ TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
 PUBLIC_URL = os.getenv("PUBLIC_URL", "https://twilio-realtime-agent-1.onrender.com")
+OPENAI_REALTIME_URL = os.getenv(
+    "OPENAI_REALTIME_URL",
+    "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview",
+)
 
-app = Flask(__name__)
-sock = Sock(app)
+REALTIME_VOICE = os.getenv("REALTIME_VOICE", "alloy")
+
+# The translator converts between Twilio's 8 kHz μ-law and OpenAI's 24 kHz PCM16
+SESSION_CONFIG = {
+    "voice": REALTIME_VOICE,
+    "input_audio_format": "pcm16",
+    "output_audio_format": "pcm16",
+}
+if VAD_COMMIT:
+    # Turns are committed by the local VAD instead of the server's
+    SESSION_CONFIG["turn_detection"] = None
+
+GREETING_INSTRUCTIONS = "Greet the caller politely in English and Tamil. Ask how you can help them."
+GREETING_LANGUAGE = "en,ta"
+GREETING_KEY = greeting_key(GREETING_INSTRUCTIONS, REALTIME_VOICE, GREETING_LANGUAGE)
+
+GREETING_EVENT = {
+    "type": "response.create",
+    "response": {
+        "instructions": GREETING_INSTRUCTIONS,
+        "modalities": ["audio"],
+        "conversation": "conversation_1"
+    }
+}
+
+app = Quart(__name__)
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+session_pool = RealtimeSessionPool(
+    OPENAI_REALTIME_URL,
+    {"Authorization": f"Bearer {OPENAI_API_KEY}", "OpenAI-Beta": "realtime=v1"},
+    SESSION_CONFIG,
+)
+greeting_cache = GreetingCache()
+log = get_logger()
+
+# Playback trackers of live calls, for the active-call and queue-depth gauges
+active_calls = set()
+metrics.gauge("realtime_active_calls", lambda: len(active_calls))
+metrics.gauge("realtime_playback_queued_frames", lambda: sum(len(p.marks) for p in list(active_calls)))
+metrics.gauge("realtime_pool_idle_sessions", lambda: len(session_pool.idle))
+metrics.gauge("realtime_pool_reserved_sessions", lambda: len(session_pool.reserved))
+
+
+@app.before_serving
+async def start_session_pool():
+    await session_pool.start()
+
+
+@app.before_serving
+async def load_greeting_cache():
+    # Greetings recorded for an older prompt/voice are stale
+    greeting_cache.prune(keep={GREETING_KEY})
+    greeting_cache.load(GREETING_KEY)
+
+
+@app.after_serving
+async def close_session_pool():
+    await session_pool.close()
+
 
 # ---------------------------------------------------------------------
 # 📞 Outbound call
 # ---------------------------------------------------------------------
-@app.route("/make_call", methods=["POST"])
-def make_call():
-    to = request.form.get("to")
-    if not to:
-        return {"error": "Missing 'to' param"}, 400
-
-    twiml = f"""
+def stream_twiml(token):
+    return f"""
     <Response>
         <Connect>
-            <Stream url="{PUBLIC_URL.replace('https','wss')}/twilio-stream" />
+            <Stream url="{PUBLIC_URL.replace('https','wss')}/twilio-stream">
+                <Parameter name="session" value="{token}" />
+            </Stream>
         </Connect>
     </Response>
     """
-    call = twilio_client.calls.create(
-        to=to,
-        from_=TWILIO_FROM_NUMBER,
-        twiml=twiml
-    )
-    print(f"📞 Outbound realtime call started: {to}")
+
+
+@app.route("/make_call", methods=["POST"])
+async def make_call():
+    form = await request.form
+    to = form.get("to")
+    if not to:
+        return {"error": "Missing 'to' param"}, 400
+
+    # Warm a Realtime session while Twilio dials; the stream claims it by token
+    token = uuid.uuid4().hex
+    session_pool.reserve(token)
+
+    try:
+        # The Twilio REST client is blocking, keep it off the event loop
+        call = await asyncio.to_thread(
+            twilio_client.calls.create,
+            to=to,
+            from_=TWILIO_FROM_NUMBER,
+            twiml=stream_twiml(token)
+        )
+    except Exception:
+        session_pool.cancel(token)
+        raise
+    log.info(f"📞 Outbound realtime call started: {to}")
     return {"sid": call.sid}, 200
 
 
+# ---------------------------------------------------------------------
+# 📋 Bulk campaigns
+# ---------------------------------------------------------------------
+campaign_dialer = None
+campaign_reservations = {}  # CallSid -> pool token, while the reservation is outstanding
+
+
+def track_campaign_reservation(call_sid, token):
+    """Remember a dial's reservation; forget ones the pool has since claimed, cancelled or expired."""
+    for sid, reserved in list(campaign_reservations.items()):
+        if reserved not in session_pool.reserved:
+            del campaign_reservations[sid]
+    if token in session_pool.reserved:
+        campaign_reservations[call_sid] = token
+
+
+@app.before_serving
+async def start_campaign_dialer():
+    global campaign_dialer
+    loop = asyncio.get_running_loop()
+
+    def place_campaign_call(to, status_callback):
+        # Runs on a dial worker thread; the session pool lives on the event loop
+        token = uuid.uuid4().hex
+        loop.call_soon_threadsafe(session_pool.reserve, token)
+        try:
+            call = twilio_client.calls.create(
+                to=to,
+                from_=TWILIO_FROM_NUMBER,
+                twiml=stream_twiml(token),
+                status_callback=status_callback,
+                status_callback_event=STATUS_CALLBACK_EVENTS,
+                status_callback_method="POST"
+            )
+        except Exception:
+            loop.call_soon_threadsafe(session_pool.cancel, token)
+            raise
+        loop.call_soon_threadsafe(track_campaign_reservation, call.sid, token)
+        return call.sid
+
+    campaign_dialer = CampaignDialer(
+        place_campaign_call,
+        f"{PUBLIC_URL}/campaigns/status",
+        os.getenv("CAMPAIGN_DB", "realtime_campaigns.db"),
+    )
+    campaign_dialer.start()
+
+
+@app.after_serving
+async def stop_campaign_dialer():
+    await asyncio.to_thread(campaign_dialer.stop)
+
+
+@app.route("/campaigns", methods=["POST"])
+async def create_campaign():
+    numbers = numbers_from_request(
+        await request.form, await request.files, await request.get_json(silent=True)
+    )
+    if not numbers:
+        return {"error": "No numbers given"}, 400
+    campaign_id = await asyncio.to_thread(campaign_dialer.create, numbers)
+    return {"id": campaign_id, "queued": len(numbers)}, 201
+
+
+@app.route("/campaigns/<int:campaign_id>", methods=["GET"])
+async def campaign_progress(campaign_id):
+    progress = await asyncio.to_thread(campaign_dialer.progress, campaign_id)
+    if progress is None:
+        return {"error": "Unknown campaign"}, 404
+    return progress
+
+
+@app.route("/campaigns/status", methods=["POST"])
+async def campaign_status():
+    form = await request.form
+    call_sid, call_status = form.get("CallSid"), form.get("CallStatus")
+    if call_status in TERMINAL_STATES:
+        # Busy, unanswered and failed calls never claim their session; hand it back now
+        token = campaign_reservations.pop(call_sid, None)
+        if token:
+            session_pool.cancel(token)
+    await asyncio.to_thread(campaign_dialer.on_status, call_sid, call_status, form.get("SequenceNumber"))
+    return "", 204
+
+
+@app.route("/greeting-cache/invalidate", methods=["POST"])
+async def invalidate_greeting_cache():
+    greeting_cache.invalidate()
+    return {"status": "invalidated"}, 200
+
+
 # ---------------------------------------------------------------------
 # 🔁 Twilio <-> OpenAI streaming bridge
 # ---------------------------------------------------------------------
-@sock.route("/twilio-stream")
-def twilio_stream(ws):
-    print("🎧 Twilio connected, starting stream...")
-
-    async def bridge():
-        uri = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview"
-        headers = [
-            ("Authorization", f"Bearer {OPENAI_API_KEY}"),
-            ("OpenAI-Beta", "realtime=v1")
-        ]
-
-        async with websockets.connect(uri, extra_headers=headers) as ai_ws:
-            print("🧠 Connected to OpenAI Realtime API")
-
-            # Send a greeting immediately so OpenAI speaks first
-            greeting_event = {
-                "type": "response.create",
-                "response": {
-                    "instructions": "Greet the caller politely in English and Tamil. Ask how you can help them.",
-                    "modalities": ["audio"],
-                    "conversation": "conversation_1"
-                }
-            }
-            await ai_ws.send(json.dumps(greeting_event))
+async def run_until_first_exits(*coros):
+    """Run coroutines as tasks; when any one finishes, cancel the rest."""
+    tasks = [asyncio.create_task(c) for c in coros]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for t in done:
+        t.result()  # re-raise the error that ended the bridge, if any
+
 
-            async def from_twilio():
-                while True:
-                    msg = ws.receive()
-                    if not msg:
-                        break
-                    await ai_ws.send(msg)
+@app.websocket("/twilio-stream")
+async def twilio_stream():
+    log.info("🎧 Twilio connected, starting stream...")
+    timer = CallTimer("realtime")
+    vad = VoiceActivityDetector() if VAD_ENABLED else None
+    translator = TwilioRealtimeTranslator(vad=vad, commit_on_end_of_turn=VAD_COMMIT)
+    playback = PlaybackTracker()
+    active_calls.add(playback)
+    claim = None
+    recorder = None
+    ai_ws = None
+    turn_ended_at = None  # when the caller last finished speaking
+    onset_at = None  # when the caller's current run of voiced frames began
 
-            async def from_openai():
-                async for msg in ai_ws:
-                    ws.send(msg)
+    async def send_audio(frame, item_id):
+        # The mark comes back from Twilio once everything before it has played
+        await websocket.send(json.dumps(frame))
+        timer.mark("first_byte_to_twilio")
+        metrics.inc("realtime_frames_to_twilio_total")
+        mark = playback.on_audio_sent(item_id, payload_bytes(frame["media"]["payload"]))
+        await websocket.send(json.dumps({
+            "event": "mark", "streamSid": translator.stream_sid, "mark": {"name": mark}
+        }))
 
-            await asyncio.gather(from_twilio(), from_openai())
+    async def barge_in(source, speech_at):
+        # `speech_at`: when the audio in which the caller started talking reached us
+        if not (playback.playing or playback.response_id):
+            return
+        if playback.playing:
+            await websocket.send(json.dumps({"event": "clear", "streamSid": translator.stream_sid}))
+        latency_ms = (time.monotonic() - speech_at) * 1000
+        metrics.observe("realtime_barge_in_ms", latency_ms)
+        for event in playback.interrupt():
+            if ai_ws:
+                await ai_ws.send(json.dumps(event))
+        log.info(f"✋ Barge-in ({source}): playback cleared {latency_ms:.1f} ms after the caller spoke")
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(bridge())
+        # Twilio sends `connected` then `start`; `start` carries the reservation token
+        while True:
+            data = json.loads(await websocket.receive())
+            if data.get("event") == "start":
+                break
+        timer.mark("twilio_start")
+        translator.from_twilio(data)
+        token = data["start"].get("customParameters", {}).get("session")
+        claim = asyncio.create_task(session_pool.claim(token))
+
+        cached = greeting_cache.get(GREETING_KEY)
+        if cached:
+            # Play the recorded greeting straight from memory while the session is handed over
+            for payload in cached.payloads:
+                await send_audio(translator.payload_frame(payload), None)
+
+        session = await claim
+        ai_ws = session.ws
+        timer.mark("openai_connect")
+        log.info("🧠 Realtime session ready")
+
+        if cached:
+            # Let the model know what the caller has already heard
+            await ai_ws.send(json.dumps({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "text", "text": cached.transcript}]
+                }
+            }))
+        else:
+            # Send a greeting immediately so OpenAI speaks first, and keep its audio
+            recorder = GreetingRecorder(greeting_cache, GREETING_KEY)
+            await ai_ws.send(json.dumps(GREETING_EVENT))
+
+        async def from_twilio():
+            nonlocal turn_ended_at, onset_at
+            while True:
+                data = json.loads(await websocket.receive())
+                received_at = time.monotonic()
+                if data.get("event") == "mark":
+                    playback.on_mark(data["mark"]["name"])
+                    continue
+                if data.get("event") == "media":
+                    metrics.inc("realtime_frames_from_twilio_total")
+
+                events = translator.from_twilio(data)
+                if vad and data.get("event") == "media":
+                    if vad.voiced_run == 1:
+                        onset_at = received_at
+                    if vad.barge_in:
+                        await barge_in("local VAD", onset_at)
+                for event in events:
+                    if event["type"] == "input_audio_buffer.commit":
+                        turn_ended_at = time.monotonic()
+                    await ai_ws.send(json.dumps(event))
+                metrics.inc("realtime_events_to_openai_total", len(events))
+                if data.get("event") == "stop":
+                    break
+
+        async def from_openai():
+            nonlocal turn_ended_at
+            async for msg in ai_ws:
+                event = json.loads(msg)
+                kind = event.get("type")
+                playback.on_openai_event(event)
+                if kind == "input_audio_buffer.speech_started":
+                    speech_at = translator.input_received_at(event.get("audio_start_ms", 0))
+                    await barge_in("server VAD", speech_at or time.monotonic())
+                    continue
+                if kind == "input_audio_buffer.speech_stopped":
+                    turn_ended_at = time.monotonic()
+                if not playback.should_play(event):
+                    continue
+                if kind == "response.audio.delta":
+                    if recorder:
+                        # Greeting time-to-first-audio; replies are in realtime_turn_latency_ms
+                        timer.mark("first_audio_delta")
+                    if turn_ended_at is not None:
+                        metrics.observe("realtime_turn_latency_ms", timer.elapsed_ms(turn_ended_at))
+                        turn_ended_at = None
+                frames = translator.from_openai(event)
+                if recorder:
+                    recorder.feed(event, frames)
+                for frame in frames:
+                    await send_audio(frame, event.get("item_id"))
+
+        await run_until_first_exits(from_twilio(), from_openai())
+    except asyncio.CancelledError:
+        # Twilio hung up: Quart cancels the handler
+        raise
     except Exception as e:
-        print("❌ Stream error:", e)
+        log.info(f"❌ Stream error: {e}")
     finally:
-        loop.close()
-        print("❎ Stream closed")
+        active_calls.discard(playback)
+        if claim:
+            claim.cancel()  # no-op once the session has been handed over
+            if claim.done() and not claim.cancelled() and not claim.exception():
+                await claim.result().close()
+        if vad:
+            metrics.inc("realtime_vad_frames_dropped_total", vad.frames_dropped)
+        log_event(
+            "call_timing",
+            stream_sid=translator.stream_sid,
+            duration_ms=round(timer.elapsed_ms()),
+            frames_forwarded=vad.frames_forwarded if vad else None,
+            frames_dropped=vad.frames_dropped if vad else None,
+            **timer.marks,
+        )
+        log.info("❎ Stream closed")
 
 
 # ---------------------------------------------------------------------
-# 🩺 Health check
+# 🩺 Health check & metrics
 # ---------------------------------------------------------------------
 @app.route("/")
-def index():
+async def index():
     return Response("✅ Twilio Realtime Agent running", mimetype="text/plain")
 
 
+@app.route("/metrics")
+async def metrics_endpoint():
+    # Reads the other workers' snapshots when METRICS_DIR is set
+    return Response(await asyncio.to_thread(metrics.render), mimetype="text/plain; version=0.0.4")
+
+
 # ---------------------------------------------------------------------
 # 🚀 Run app
 # ---------------------------------------------------------------------
+# Every worker process runs one event loop that serves all of its calls.
+# Scale out with more processes, e.g.:
+#   uvicorn realtime_agent:app --host 0.0.0.0 --port 10000 --workers 4
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.getenv("PORT", 10000))
-    print(f"🚀 Running on 0.0.0.0:{port}")
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    print(f"🚀 Running on 0.0.0.0:{port} with {workers} worker(s)")
+    uvicorn.run("realtime_agent:app", host="0.0.0.0", port=port, workers=workers)
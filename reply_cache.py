@@ -0,0 +1,44 @@
+import os
+import re
+import hashlib
+from conversation_store import MemoryBackend
+
+# ---------------------------------------------------------------------
+# 🔧 Cache configuration
+# ---------------------------------------------------------------------
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", 1000))
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", 3600))
+REPLY_CACHE_MAX_WORDS = int(os.getenv("REPLY_CACHE_MAX_WORDS", 3))  # only short utterances are cached
+
+
+def normalize_utterance(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+class ReplyCache:
+    """
+    Replies to short, frequent utterances ("yes", "hello", "bye"), keyed on
+    the normalized utterance and a hash of what the assistant said last, so
+    the same word in a different context is a different entry.
+    """
+
+    def __init__(self, backend=None, max_words=REPLY_CACHE_MAX_WORDS):
+        self.backend = backend or MemoryBackend(ttl=REPLY_CACHE_TTL, max_calls=REPLY_CACHE_SIZE)
+        self.max_words = max_words
+
+    def key(self, utterance, context):
+        normalized = normalize_utterance(utterance)
+        if not normalized or len(normalized.split()) > self.max_words:
+            return None
+        raw = normalized + "\0" + normalize_utterance(context)
+        return "reply:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, utterance, context):
+        key = self.key(utterance, context)
+        return self.backend.get(key) if key else None
+
+    def put(self, utterance, context, reply):
+        key = self.key(utterance, context)
+        if key:
+            self.backend.put(key, reply)
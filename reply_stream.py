@@ -0,0 +1,61 @@
+import re
+import json
+import time
+
+# Split after sentence punctuation that is followed by whitespace
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+class SentenceSplitter:
+    """Turns a stream of text deltas into complete sentences."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, delta):
+        self.buffer += delta
+        parts = SENTENCE_END.split(self.buffer)
+        self.buffer = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self):
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class PendingReplies:
+    """
+    Sentences of replies that are still being generated, published through a
+    conversation-store backend so whichever worker Twilio's <Redirect> lands
+    on can pick up the rest.
+
+    State per reply: {"sentences": [...], "done": bool, "should_end": bool}
+    """
+
+    def __init__(self, backend, poll_interval=0.05):
+        self.backend = backend
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _key(reply_id):
+        return f"pending:{reply_id}"
+
+    def publish(self, reply_id, sentences, done, should_end):
+        self.backend.put(self._key(reply_id), json.dumps(
+            {"sentences": sentences, "done": done, "should_end": should_end}, ensure_ascii=False
+        ))
+
+    def wait(self, reply_id, after, timeout):
+        """Wait for sentences past index `after` (or completion); None if the reply is unknown."""
+        deadline = time.monotonic() + timeout
+        while True:
+            raw = self.backend.get(self._key(reply_id))
+            state = json.loads(raw) if raw else None
+            if state and (len(state["sentences"]) > after or state["done"]):
+                return state
+            if time.monotonic() >= deadline:
+                return state
+            time.sleep(self.poll_interval)
+
+    def discard(self, reply_id):
+        self.backend.delete(self._key(reply_id))
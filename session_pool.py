@@ -0,0 +1,208 @@
+import os
+import time
+import json
+import asyncio
+from collections import deque
+import websockets
+from websockets.protocol import State
+from metrics import get_logger
+
+# ---------------------------------------------------------------------
+# 🔧 Pool configuration
+# ---------------------------------------------------------------------
+POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", 2))
+POOL_MAX_IDLE = float(os.getenv("REALTIME_POOL_MAX_IDLE", 300))          # seconds a warm session may sit unused
+POOL_HEALTH_INTERVAL = float(os.getenv("REALTIME_POOL_HEALTH_INTERVAL", 15))
+POOL_RESERVATION_TTL = float(os.getenv("REALTIME_POOL_RESERVATION_TTL", 120))  # ringing time before a reservation lapses
+CONNECT_TIMEOUT = float(os.getenv("REALTIME_CONNECT_TIMEOUT", 10))
+# A reservation only helps if the stream reaches the worker that made it, which
+# uvicorn/gunicorn can't promise with several workers on one port
+POOL_RESERVE = os.getenv(
+    "REALTIME_POOL_RESERVE", "1" if int(os.getenv("WEB_CONCURRENCY", 1)) <= 1 else "0"
+) == "1"
+PING_TIMEOUT = 5
+
+log = get_logger()
+
+
+class PooledSession:
+    """A Realtime WebSocket that has already been configured with `session.update`."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.created = time.monotonic()
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created
+
+    async def close(self):
+        await self.ws.close()
+
+
+class RealtimeSessionPool:
+    """
+    Keeps `size` connected, configured Realtime sessions warm so a call can
+    start talking without waiting for TLS, the handshake and session setup.
+
+    `/make_call` reserves a session under a token; the Twilio stream claims
+    it when it attaches. Sessions are single-use: a finished call closes its
+    socket and the maintainer connects a replacement. With `per_call_reserve`
+    off, `reserve()` is a no-op and every stream takes a warm session from
+    the worker it lands on.
+    """
+
+    def __init__(self, url, headers, session_config, size=POOL_SIZE, max_idle=POOL_MAX_IDLE,
+                 health_interval=POOL_HEALTH_INTERVAL, reservation_ttl=POOL_RESERVATION_TTL,
+                 per_call_reserve=POOL_RESERVE):
+        self.url = url
+        self.headers = headers
+        self.session_config = session_config
+        self.size = size
+        self.max_idle = max_idle
+        self.health_interval = health_interval
+        self.reservation_ttl = reservation_ttl
+        self.per_call_reserve = per_call_reserve
+        self.idle = deque()
+        self.reserved = {}  # token -> (task resolving to a PooledSession, reserved_at)
+        self._wakeup = asyncio.Event()
+        self._maintainer = None
+
+    # --- Lifecycle ---
+    async def start(self):
+        self._maintainer = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        if self._maintainer:
+            self._maintainer.cancel()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+        for task, _ in self.reserved.values():
+            task.cancel()
+        reserved = await asyncio.gather(*(t for t, _ in self.reserved.values()), return_exceptions=True)
+        self.reserved.clear()
+        sessions = [s for s in reserved if isinstance(s, PooledSession)] + list(self.idle)
+        self.idle.clear()
+        await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+
+    # --- Connecting ---
+    async def connect(self):
+        ws = await asyncio.wait_for(
+            websockets.connect(self.url, additional_headers=self.headers), CONNECT_TIMEOUT
+        )
+        try:
+            await ws.send(json.dumps({"type": "session.update", "session": self.session_config}))
+            await asyncio.wait_for(self._wait_for(ws, "session.updated"), CONNECT_TIMEOUT)
+        except BaseException:
+            await ws.close()
+            raise
+        return PooledSession(ws)
+
+    @staticmethod
+    async def _wait_for(ws, event_type):
+        async for msg in ws:
+            event = json.loads(msg)
+            if event.get("type") == event_type:
+                return event
+            if event.get("type") == "error":
+                raise RuntimeError(f"Realtime session setup failed: {event.get('error')}")
+        raise ConnectionError(f"Realtime socket closed before {event_type}")
+
+    # --- Handing out sessions ---
+    def _usable(self, session):
+        return session.ws.state is State.OPEN and session.age < self.max_idle
+
+    async def acquire(self):
+        """Take a warm session, or connect one on the spot if the pool is empty."""
+        self._wakeup.set()  # let the maintainer top the pool back up
+        while self.idle:
+            session = self.idle.popleft()
+            if self._usable(session):
+                return session
+            asyncio.create_task(session.close())
+        return await self.connect()
+
+    def reserve(self, token):
+        """Set a session aside for the call that will attach with `token`."""
+        if not self.per_call_reserve:
+            return
+        self.reserved[token] = (asyncio.create_task(self.acquire()), time.monotonic())
+
+    def cancel(self, token):
+        """Give a reservation back to the pool (e.g. the dial failed)."""
+        entry = self.reserved.pop(token, None)
+        if entry:
+            entry[0].add_done_callback(self._return_to_pool)
+
+    async def claim(self, token):
+        """Pick up the session reserved for `token`; fall back to any warm session."""
+        entry = self.reserved.pop(token, None) if token else None
+        if entry:
+            try:
+                session = await entry[0]
+                if self._usable(session):
+                    return session
+                await session.close()
+            except Exception as e:
+                log.info(f"⚠️ Reserved Realtime session failed: {e}")
+        return await self.acquire()
+
+    def _return_to_pool(self, task):
+        if task.cancelled() or task.exception():
+            return
+        session = task.result()
+        if self._usable(session) and len(self.idle) < self.size:
+            self.idle.appendleft(session)
+        else:
+            asyncio.create_task(session.close())
+
+    # --- Background maintenance ---
+    async def _maintain(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                self._expire_reservations()
+                await self._health_check()
+                await self._fill()
+            except Exception as e:
+                log.info(f"⚠️ Session pool maintenance error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _expire_reservations(self):
+        now = time.monotonic()
+        for token, (_, reserved_at) in list(self.reserved.items()):
+            if now - reserved_at > self.reservation_ttl:
+                self.cancel(token)
+
+    async def _health_check(self):
+        sessions = list(self.idle)
+        results = await asyncio.gather(*(self._ping(s) for s in sessions))
+        for session, healthy in zip(sessions, results):
+            if healthy or session not in self.idle:
+                continue
+            self.idle.remove(session)
+            await session.close()
+
+    async def _ping(self, session):
+        if not self._usable(session):
+            return False
+        try:
+            await asyncio.wait_for(await session.ws.ping(), PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _fill(self):
+        missing = self.size - len(self.idle)
+        if missing <= 0:
+            return
+        results = await asyncio.gather(*(self.connect() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, PooledSession) and len(self.idle) < self.size:
+                self.idle.append(result)
+            elif isinstance(result, PooledSession):
+                await result.close()  # a cancelled reservation refilled the pool meanwhile
+            else:
+                log.info(f"⚠️ Could not warm Realtime session: {result}")
@@ -0,0 +1,25 @@
+import os
+import sys
+import socket
+import tempfile
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# The apps read their configuration at import time
+_workdir = tempfile.mkdtemp(prefix="agent-tests-")
+FAKE_REALTIME_PORT = _free_port()
+os.environ.update(
+    OPENAI_API_KEY="sk-test",
+    OPENAI_REALTIME_URL=f"ws://127.0.0.1:{FAKE_REALTIME_PORT}",
+    GREETING_CACHE_DIR=os.path.join(_workdir, "greetings"),
+    CAMPAIGN_DB=os.path.join(_workdir, "campaigns.db"),
+    REALTIME_POOL_SIZE="1",
+)
+os.environ.pop("METRICS_DIR", None)
+os.environ.pop("WEB_CONCURRENCY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
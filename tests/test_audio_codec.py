@@ -0,0 +1,89 @@
+import base64
+import numpy as np
+import pytest
+from audio_codec import (
+    ULAW_DECODE, ulaw_to_pcm16, pcm16_to_ulaw, payload_bytes, Upsampler, Downsampler,
+    TwilioRealtimeTranslator, TWILIO_RATE, OPENAI_RATE,
+)
+
+
+def tone(freq, rate, seconds=0.5, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def rms(x):
+    return float(np.sqrt(np.mean(np.asarray(x, dtype=np.float64) ** 2)))
+
+
+def test_ulaw_decode_table_matches_g711():
+    audioop = pytest.importorskip("audioop")  # removed from the stdlib in 3.13
+    reference = np.frombuffer(audioop.ulaw2lin(bytes(range(256)), 2), dtype="<i2")
+    assert np.array_equal(ULAW_DECODE, reference)
+
+
+def test_ulaw_round_trip_of_every_code():
+    codes = bytes(range(256))
+    decoded = ulaw_to_pcm16(codes)
+    assert np.array_equal(ulaw_to_pcm16(pcm16_to_ulaw(decoded)), decoded)
+
+
+def test_ulaw_encoding_is_monotonic_and_close():
+    x = np.arange(-32768, 32768, 7, dtype=np.int16)
+    y = ulaw_to_pcm16(pcm16_to_ulaw(x)).astype(np.int32)
+    assert np.all(np.diff(y) >= 0)
+    # μ-law keeps error within about 1/16 of the magnitude (plus the smallest step)
+    assert np.all(np.abs(y - x) <= np.abs(x.astype(np.int32)) / 16 + 8)
+
+
+def test_pcm16_to_ulaw_accepts_bytes():
+    x = np.array([0, 1000, -1000, 32767, -32768], dtype="<i2")
+    assert pcm16_to_ulaw(x.tobytes()) == pcm16_to_ulaw(x)
+
+
+def test_payload_bytes():
+    for n in range(1, 10):
+        assert payload_bytes(base64.b64encode(b"x" * n).decode()) == n
+
+
+def test_upsampler_length_and_streaming():
+    x = tone(440, TWILIO_RATE)
+    whole = Upsampler().process(x)
+    assert len(whole) == 3 * len(x)
+    up = Upsampler()
+    chunked = np.concatenate([up.process(x[i:i + 160]) for i in range(0, len(x), 160)])
+    assert np.array_equal(chunked, whole)
+
+
+def test_downsampler_streaming_matches_one_shot():
+    x = tone(440, OPENAI_RATE)
+    whole = Downsampler().process(x)
+    assert len(whole) == len(x) // 3
+    down = Downsampler()
+    # Odd chunk sizes exercise the decimation phase carried across chunks
+    chunked = np.concatenate([down.process(x[i:i + 1001]) for i in range(0, len(x), 1001)])
+    assert np.array_equal(chunked, whole)
+
+
+def test_downsampler_keeps_voice_band_and_removes_aliases():
+    voice = Downsampler().process(tone(1000, OPENAI_RATE))[100:]
+    alias = Downsampler().process(tone(6000, OPENAI_RATE))[100:]
+    assert rms(voice) > 0.9 * 8000 / np.sqrt(2)
+    assert rms(alias) < 0.05 * rms(voice)
+
+
+def test_up_then_down_preserves_a_tone():
+    x = tone(500, TWILIO_RATE)
+    y = Downsampler().process(Upsampler().process(x)).astype(np.float32)
+    # Up + down adds a few samples of filter delay; compare at the best lag
+    best = max(np.corrcoef(x[200:-200], y[200 + lag:len(y) - 200 + lag])[0, 1] for lag in range(-8, 9))
+    assert best > 0.99
+
+
+def test_translator_coalesces_frames():
+    translator = TwilioRealtimeTranslator(chunk_ms=100)
+    frame = {"event": "media", "media": {"payload": base64.b64encode(b"\xff" * 160).decode()}}
+    events = [e for _ in range(10) for e in translator.from_twilio(frame)]
+    assert [e["type"] for e in events] == ["input_audio_buffer.append"] * 2
+    assert len(base64.b64decode(events[0]["audio"])) == 800 * 3 * 2  # 100 ms at 24 kHz PCM16
+    assert translator.input_ms == 200
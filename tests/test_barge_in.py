@@ -0,0 +1,98 @@
+import json
+import base64
+import asyncio
+import numpy as np
+import pytest
+from conftest import FAKE_REALTIME_PORT
+from audio_codec import pcm16_to_ulaw, TWILIO_RATE
+from fake_realtime import FakeRealtimeServer
+import realtime_agent
+
+SILENCE = base64.b64encode(b"\xff" * 160).decode("ascii")
+
+
+def speech_frame(i):
+    t = (np.arange(160) + 160 * i) / TWILIO_RATE
+    return base64.b64encode(pcm16_to_ulaw((8000 * np.sin(2 * np.pi * 200 * t)).astype(np.int16))).decode("ascii")
+
+
+def media(payload):
+    return json.dumps({"event": "media", "streamSid": "MZtest", "media": {"payload": payload}})
+
+
+async def interrupt_greeting(fake, frames):
+    """
+    Twilio end of one call: play the greeting, ack the first few marks, then
+    talk over it with `frames`. Returns the messages the agent sent Twilio.
+    """
+    sent = []
+    async with realtime_agent.app.test_app() as app:
+        async with app.test_client().websocket("/twilio-stream") as ws:
+            await ws.send(json.dumps({
+                "event": "start",
+                "start": {"streamSid": "MZtest", "callSid": "CAtest", "customParameters": {}},
+            }))
+            # Let some of the greeting play: echo marks as if Twilio had played the audio
+            while sum(1 for m in sent if m["event"] == "mark") < 5:
+                sent.append(json.loads(await asyncio.wait_for(ws.receive(), 5)))
+                if sent[-1]["event"] == "mark":
+                    await ws.send(json.dumps({"event": "mark", "streamSid": "MZtest", "mark": sent[-1]["mark"]}))
+
+            async def receive():
+                while True:
+                    sent.append(json.loads(await ws.receive()))
+
+            receiver = asyncio.create_task(receive())
+            for payload in frames:
+                await ws.send(media(payload))
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.3)
+            receiver.cancel()
+    return sent
+
+
+def run_call(frames, **fake_options):
+    async def main():
+        fake = await FakeRealtimeServer(port=FAKE_REALTIME_PORT, **fake_options).start()
+        try:
+            return fake, await interrupt_greeting(fake, frames)
+        finally:
+            await fake.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def fresh_greeting():
+    # Every call must speak the greeting live, not replay it from the cache
+    realtime_agent.greeting_cache.invalidate()
+    yield
+    realtime_agent.greeting_cache.invalidate()
+
+
+def assert_barged_in(fake, sent):
+    assert any(m["event"] == "clear" for m in sent)
+    kinds = [e["type"] for e in fake.received]
+    assert "response.cancel" in kinds
+    truncate = next(e for e in fake.received if e["type"] == "conversation.item.truncate")
+    assert truncate["item_id"] == "item_1"
+    assert truncate["audio_end_ms"] == 500  # five 100 ms deltas acknowledged
+
+
+def test_local_vad_barge_in_clears_cancels_and_truncates():
+    fake, sent = run_call([speech_frame(i) for i in range(10)], delta_interval=0.05, tone_ms=3000)
+    assert_barged_in(fake, sent)
+
+
+def test_server_vad_barge_in(monkeypatch):
+    monkeypatch.setattr(realtime_agent, "VAD_ENABLED", False)
+    fake, sent = run_call([SILENCE] * 10, delta_interval=0.05, tone_ms=3000)
+    assert_barged_in(fake, sent)
+
+
+def test_noise_burst_does_not_barge_in():
+    frames = [speech_frame(0)] + [SILENCE] * 9  # one voiced frame, e.g. a click
+    # Only the local VAD is under test; the fake's server VAD fires on any input
+    fake, sent = run_call(frames, delta_interval=0.05, tone_ms=3000, server_vad=False)
+    assert not any(m["event"] == "clear" for m in sent)
+    assert "response.cancel" not in [e["type"] for e in fake.received]
@@ -0,0 +1,155 @@
+import time
+import threading
+import pytest
+from twilio.base.exceptions import TwilioRestException
+from campaign import CampaignDialer, parse_numbers, is_transient, numbers_from_request
+
+
+class FakeTwilioCalls:
+    """
+    Stand-in for `twilio_client.calls`: `create()` returns an object with a
+    `sid` and can be told to fail the first attempts for a number.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = []  # (time, to)
+        self.failures = {}  # to -> exceptions to raise, in order
+        self.count = 0
+
+    def create(self, to, **kwargs):
+        with self.lock:
+            self.created.append((time.monotonic(), to))
+            if self.failures.get(to):
+                raise self.failures[to].pop(0)
+            self.count += 1
+            return type("Call", (), {"sid": f"CA{self.count:04d}", "to": to})()
+
+    def sids(self):
+        return [f"CA{i:04d}" for i in range(1, self.count + 1)]
+
+
+@pytest.fixture
+def twilio():
+    return FakeTwilioCalls()
+
+
+@pytest.fixture
+def make_dialer(tmp_path, twilio):
+    dialers = []
+
+    def make(**options):
+        def place_call(to, status_callback):
+            return twilio.create(to=to, status_callback=status_callback).sid
+
+        options.setdefault("calls_per_second", 100)
+        options.setdefault("backoff", 0.05)
+        dialer = CampaignDialer(place_call, "https://example.test/campaigns/status", str(tmp_path / "c.db"), **options)
+        dialer.start()
+        dialers.append(dialer)
+        return dialer
+
+    yield make
+    for dialer in dialers:
+        dialer.stop()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+
+def test_parse_numbers():
+    assert parse_numbers("name,phone\nA,+911\nB,+912\n") == ["+911", "+912"]
+    assert parse_numbers("+911\n\n+912\n") == ["+911", "+912"]
+    assert numbers_from_request({"numbers": "+911,+912"}, None, None) == ["+911", "+912"]
+    assert numbers_from_request(None, None, {"numbers": [" +911 ", ""]}) == ["+911"]
+
+
+def test_is_transient():
+    assert is_transient(TwilioRestException(429, "uri"))
+    assert is_transient(TwilioRestException(503, "uri"))
+    assert not is_transient(TwilioRestException(400, "uri"))
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(ValueError())
+
+
+def test_dials_every_number_and_finishes(make_dialer, twilio):
+    dialer = make_dialer()
+    campaign = dialer.create(["+911", "+912", "+913"])
+    wait_for(lambda: twilio.count == 3)
+    for sid in twilio.sids():
+        dialer.on_status(sid, "completed", 5)
+    progress = dialer.progress(campaign)
+    assert progress["done"] and progress["statuses"] == {"completed": 3}
+
+
+def test_transient_errors_are_retried_with_backoff(make_dialer, twilio):
+    twilio.failures["+911"] = [TwilioRestException(429, "uri"), TwilioRestException(500, "uri")]
+    dialer = make_dialer(backoff=0.1)
+    dialer.create(["+911"])
+    wait_for(lambda: twilio.count == 1)
+    attempts = [t for t, to in twilio.created if to == "+911"]
+    assert len(attempts) == 3
+    # Backoff doubles per retry (with ±20% jitter)
+    assert attempts[1] - attempts[0] >= 0.08
+    assert attempts[2] - attempts[1] >= 0.16
+
+
+def test_permanent_errors_fail_without_retry(make_dialer, twilio):
+    twilio.failures["+911"] = [TwilioRestException(400, "uri", msg="invalid number")]
+    dialer = make_dialer()
+    campaign = dialer.create(["+911"])
+    wait_for(lambda: dialer.progress(campaign)["done"])
+    assert len(twilio.created) == 1
+    assert dialer.progress(campaign)["statuses"] == {"failed": 1}
+
+
+def test_max_live_caps_calls_in_flight(make_dialer, twilio):
+    dialer = make_dialer(max_live=2)
+    dialer.create([f"+91{i}" for i in range(5)])
+    wait_for(lambda: twilio.count == 2)
+    time.sleep(0.3)
+    assert twilio.count == 2
+    dialer.on_status("CA0001", "busy")
+    wait_for(lambda: twilio.count == 3)
+    time.sleep(0.3)
+    assert twilio.count == 3
+
+
+def test_out_of_order_callbacks_do_not_revive_a_finished_call(make_dialer, twilio):
+    dialer = make_dialer(max_live=1)
+    campaign = dialer.create(["+911", "+912"])
+    wait_for(lambda: twilio.count == 1)
+    dialer.on_status("CA0001", "completed", 3)
+    dialer.on_status("CA0001", "ringing", 1)   # late, with a lower sequence number
+    dialer.on_status("CA0001", "in-progress")  # late, without one
+    wait_for(lambda: twilio.count == 2)
+    dialer.on_status("CA0002", "ringing", 2)
+    dialer.on_status("CA0002", "initiated", 1)
+    assert dialer.progress(campaign)["statuses"] == {"completed": 1, "ringing": 1}
+    dialer.on_status("CA0002", "no-answer", 4)
+    assert dialer.progress(campaign)["done"]
+
+
+def test_pacing(make_dialer, twilio):
+    dialer = make_dialer(calls_per_second=10)
+    dialer.create([f"+91{i}" for i in range(5)])
+    wait_for(lambda: twilio.count == 5)
+    times = [t for t, _ in twilio.created]
+    assert times[-1] - times[0] >= 0.35
+
+
+def test_queue_resumes_after_restart(tmp_path, twilio, make_dialer):
+    first = make_dialer(max_live=1)
+    campaign = first.create(["+911", "+912"])
+    wait_for(lambda: twilio.count == 1)
+    first.stop()
+    first.on_status("CA0001", "completed")
+    second = make_dialer(max_live=1)
+    wait_for(lambda: twilio.count == 2)
+    second.on_status("CA0002", "completed")
+    assert second.progress(campaign)["done"]
@@ -0,0 +1,98 @@
+import time
+import pytest
+from conversation_store import MemoryBackend, SQLiteBackend, ConversationStore, Conversation
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**caps):
+        if request.param == "memory":
+            return MemoryBackend(**caps)
+        return SQLiteBackend(str(tmp_path / "conversations.db"), evict_interval=0, **caps)
+    return make
+
+
+def stored(backend, keys):
+    return [k for k in keys if backend.get(k) is not None]
+
+
+def test_round_trip_and_delete(make_backend):
+    backend = make_backend()
+    backend.put("CA1", "hello")
+    assert backend.get("CA1") == "hello"
+    backend.delete("CA1")
+    assert backend.get("CA1") is None
+
+
+def test_call_count_cap_evicts_least_recent(make_backend):
+    backend = make_backend(max_calls=3)
+    for i in range(5):
+        backend.put(f"CA{i}", "x")
+        time.sleep(0.01)
+    assert stored(backend, [f"CA{i}" for i in range(5)]) == ["CA2", "CA3", "CA4"]
+
+
+def test_byte_cap(make_backend):
+    backend = make_backend(max_bytes=250)
+    for i in range(5):
+        backend.put(f"CA{i}", "x" * 100)
+        time.sleep(0.01)
+    assert stored(backend, [f"CA{i}" for i in range(5)]) == ["CA3", "CA4"]
+
+
+def test_ttl_counts_from_last_write(make_backend):
+    backend = make_backend(ttl=0.2)
+    backend.put("CA1", "x")
+    time.sleep(0.12)
+    assert backend.get("CA1") == "x"  # reading doesn't extend the TTL...
+    time.sleep(0.12)
+    assert backend.get("CA1") is None
+    backend.put("CA2", "x")
+    time.sleep(0.12)
+    backend.put("CA2", "y")  # ...writing does
+    time.sleep(0.12)
+    assert backend.get("CA2") == "y"
+
+
+def test_sqlite_get_does_not_write(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "c.db"))
+    backend.put("CA1", "x")
+    before = backend._db().total_changes
+    backend.get("CA1")
+    assert backend._db().total_changes == before
+
+
+def test_trim_keeps_recent_turns_within_budget():
+    conversation = Conversation()
+    for i in range(20):
+        conversation.add("user", f"turn {i} " + "x" * 40)
+    dropped = conversation.trim(100)
+    assert dropped and dropped[0]["content"].startswith("turn 0")
+    assert conversation.turns[-1]["content"].startswith("turn 19")
+
+
+def test_summary_is_folded_in_the_background():
+    calls = []
+
+    def summarize(summary, turns):
+        time.sleep(0.2)
+        calls.append(len(turns))
+        return (summary + " " if summary else "") + "/".join(t["content"][:6] for t in turns)
+
+    store = ConversationStore(MemoryBackend(), token_budget=40, summarize=summarize)
+    conversation = store.load("CA1")
+    for i in range(4):
+        conversation.add("user", f"turn {i} " + "x" * 60)
+        started = time.monotonic()
+        store.save("CA1", conversation)
+        assert time.monotonic() - started < 0.1  # never waits on the summary model
+        conversation = store.load("CA1")
+
+    deadline = time.monotonic() + 3
+    while store.unsummarized and time.monotonic() < deadline:
+        time.sleep(0.05)
+    summary = store.load("CA1").summary
+    assert summary.index("turn 0") < summary.index("turn 1") < summary.index("turn 2")
+
+    store.delete("CA1")
+    assert store.backend.get("summary:CA1") is None
@@ -0,0 +1,51 @@
+from playback import PlaybackTracker
+
+FRAME = 160  # 20 ms of μ-law
+
+
+def tracker_with_frames(n, item_id="item_1", response_id="resp_1"):
+    playback = PlaybackTracker()
+    playback.on_openai_event({"type": "response.created", "response": {"id": response_id}})
+    marks = [playback.on_audio_sent(item_id, FRAME) for _ in range(n)]
+    return playback, marks
+
+
+def test_marks_advance_played_audio():
+    playback, marks = tracker_with_frames(5)
+    playback.on_mark(marks[2])
+    assert playback.played_ms == 60
+    assert len(playback.marks) == 2 and playback.playing
+
+
+def test_unknown_mark_is_ignored():
+    playback, marks = tracker_with_frames(3)
+    playback.on_mark("audio-999")  # e.g. echoed after a clear
+    assert playback.played_ms == 0
+    assert len(playback.marks) == 3
+
+
+def test_late_echo_after_interrupt_does_not_eat_new_marks():
+    playback, old = tracker_with_frames(3)
+    playback.interrupt()
+    playback.on_openai_event({"type": "response.created", "response": {"id": "resp_2"}})
+    new = [playback.on_audio_sent("item_2", FRAME) for _ in range(2)]
+    playback.on_mark(old[1])
+    assert [m[0] for m in playback.marks] == new
+
+
+def test_interrupt_cancels_and_truncates_to_played_audio():
+    playback, marks = tracker_with_frames(10)
+    playback.on_mark(marks[3])
+    events = playback.interrupt()
+    assert events == [
+        {"type": "response.cancel"},
+        {"type": "conversation.item.truncate", "item_id": "item_1", "content_index": 0, "audio_end_ms": 80},
+    ]
+    assert not playback.playing and playback.response_id is None
+    assert not playback.should_play({"type": "response.audio.delta", "response_id": "resp_1"})
+
+
+def test_interrupt_with_nothing_playing_only_cancels():
+    playback = PlaybackTracker()
+    playback.on_openai_event({"type": "response.created", "response": {"id": "resp_1"}})
+    assert playback.interrupt() == [{"type": "response.cancel"}]
@@ -0,0 +1,52 @@
+import numpy as np
+from audio_codec import pcm16_to_ulaw, TWILIO_RATE
+from vad import VoiceActivityDetector, FRAME_MS
+
+SILENT = b"\xff" * 160
+
+
+def voiced(i=0):
+    t = (np.arange(160) + 160 * i) / TWILIO_RATE
+    return pcm16_to_ulaw((8000 * np.sin(2 * np.pi * 200 * t)).astype(np.int16))
+
+
+def test_silence_is_dropped():
+    vad = VoiceActivityDetector()
+    assert all(vad.process(SILENT) == (b"", False) for _ in range(50))
+    assert vad.frames_forwarded == 0 and vad.frames_dropped == 50
+
+
+def test_onset_carries_preroll():
+    vad = VoiceActivityDetector(preroll_ms=100)
+    for _ in range(20):
+        vad.process(SILENT)
+    out, _ = vad.process(voiced())
+    assert out == SILENT * 5 + voiced()
+    assert vad.in_speech
+
+
+def test_hangover_then_end_of_turn():
+    vad = VoiceActivityDetector(hangover_ms=100, end_of_turn_ms=200)
+    vad.process(voiced())
+    results = [vad.process(SILENT) for _ in range(12)]
+    forwarded = [out != b"" for out, _ in results]
+    assert forwarded == [True] * 5 + [False] * 7
+    ends = [i for i, (_, end) in enumerate(results) if end]
+    assert ends == [200 // FRAME_MS - 1]  # reported once
+
+
+def test_noise_is_not_speech():
+    vad = VoiceActivityDetector()
+    rng = np.random.default_rng(1)
+    hiss = [pcm16_to_ulaw(rng.normal(0, 300, 160).astype(np.int16)) for _ in range(200)]
+    assert sum(vad.is_voiced(f) for f in hiss) < 40
+
+
+def test_barge_in_needs_a_sustained_onset():
+    vad = VoiceActivityDetector(barge_in_ms=100)
+    fired = []
+    for i, frame in enumerate([voiced(0), SILENT] * 3 + [voiced(i) for i in range(8)]):
+        vad.process(frame)
+        fired.append(vad.barge_in)
+    assert fired.count(True) == 1
+    assert fired.index(True) == 6 + 100 // FRAME_MS - 1
@@ -0,0 +1,94 @@
+import os
+from collections import deque
+import numpy as np
+from audio_codec import ulaw_to_pcm16
+
+# ---------------------------------------------------------------------
+# 🔧 VAD tuning (per deployment)
+# ---------------------------------------------------------------------
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_ENERGY_DB = float(os.getenv("VAD_ENERGY_DB", -45))       # frame RMS (dBFS) needed to count as speech
+VAD_MAX_ZCR = float(os.getenv("VAD_MAX_ZCR", 0.45))          # above this zero-crossing rate a quiet frame is noise
+VAD_LOUD_DB = float(os.getenv("VAD_LOUD_DB", -30))           # frames this loud count as speech whatever their ZCR
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", 600))     # keep forwarding this long after speech stops
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", 200))       # audio replayed in front of a speech onset
+VAD_END_OF_TURN_MS = int(os.getenv("VAD_END_OF_TURN_MS", 800))
+VAD_BARGE_IN_MS = int(os.getenv("VAD_BARGE_IN_MS", 120))     # unbroken voiced audio before the caller interrupts the agent
+VAD_COMMIT = os.getenv("VAD_COMMIT", "0") == "1"             # commit the input buffer locally on end-of-turn
+
+FRAME_MS = 20  # Twilio media frame length
+
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing gate for Twilio μ-law frames.
+
+    `process()` returns the μ-law to forward (empty while silent, pre-roll
+    plus the frame at a speech onset) and whether a turn just ended.
+    `barge_in` turns true on the frame that completes `barge_in_ms` of
+    unbroken voiced audio, so a single click or breath doesn't interrupt.
+    """
+
+    def __init__(self, energy_db=VAD_ENERGY_DB, max_zcr=VAD_MAX_ZCR, loud_db=VAD_LOUD_DB,
+                 hangover_ms=VAD_HANGOVER_MS, preroll_ms=VAD_PREROLL_MS, end_of_turn_ms=VAD_END_OF_TURN_MS,
+                 barge_in_ms=VAD_BARGE_IN_MS):
+        self.energy_db = energy_db
+        self.max_zcr = max_zcr
+        self.loud_db = loud_db
+        self.hangover_frames = hangover_ms // FRAME_MS
+        self.end_of_turn_frames = end_of_turn_ms // FRAME_MS
+        self.barge_in_frames = max(1, barge_in_ms // FRAME_MS)
+        self.preroll = deque(maxlen=max(1, preroll_ms // FRAME_MS))
+        self.in_speech = False
+        self.turn_open = False
+        self.silent_frames = 0
+        self.voiced_run = 0  # consecutive voiced frames up to the current one
+        self.frames_seen = 0
+        self.frames_forwarded = 0
+
+    @property
+    def barge_in(self):
+        return self.voiced_run == self.barge_in_frames
+
+    @property
+    def frames_dropped(self):
+        return self.frames_seen - self.frames_forwarded
+
+    def is_voiced(self, ulaw):
+        pcm = ulaw_to_pcm16(ulaw).astype(np.float32)
+        if len(pcm) < 2:
+            return False
+        rms = np.sqrt(np.mean(pcm * pcm)) / 32768
+        level_db = 20 * np.log10(rms + 1e-9)
+        zcr = np.count_nonzero(np.signbit(pcm[1:]) != np.signbit(pcm[:-1])) / (len(pcm) - 1)
+        return level_db >= self.loud_db or (level_db >= self.energy_db and zcr <= self.max_zcr)
+
+    def process(self, ulaw):
+        self.frames_seen += 1
+
+        if self.is_voiced(ulaw):
+            self.voiced_run += 1
+            out = ulaw
+            if not self.in_speech:
+                out = b"".join(self.preroll) + ulaw
+                self.frames_forwarded += len(self.preroll)
+                self.preroll.clear()
+            self.in_speech = True
+            self.turn_open = True
+            self.silent_frames = 0
+            self.frames_forwarded += 1
+            return out, False
+
+        self.voiced_run = 0
+        self.silent_frames += 1
+        end_of_turn = self.turn_open and self.silent_frames >= self.end_of_turn_frames
+        if end_of_turn:
+            self.turn_open = False
+
+        if self.in_speech and self.silent_frames <= self.hangover_frames:
+            self.frames_forwarded += 1
+            return ulaw, end_of_turn
+
+        self.in_speech = False
+        self.preroll.append(ulaw)
+        return b"", end_of_turn